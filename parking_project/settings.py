@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -74,11 +75,42 @@ WSGI_APPLICATION = 'parking_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Configurée par variables d'environnement : SQLite par défaut, PostgreSQL si DATABASE_ENGINE=postgresql
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    # Connexions persistantes (réutilisées entre les requêtes), vérifiées avant chaque réutilisation
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'parking'),
+            'USER': os.environ.get('DATABASE_USER', 'parking'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            # Attente (en secondes) d'un verrou tenu par une autre connexion avant l'erreur "database is locked"
+            'OPTIONS': {'timeout': int(os.environ.get('DATABASE_TIMEOUT', 20))},
+        }
+    }
+
+# Réglages appliqués à chaque connexion SQLite (parking_tracker.utils.database) :
+# journal WAL (les lectures du tableau de bord ne bloquent plus l'écriture des lots, et inversement),
+# synchronisation disque allégée (sûre en WAL), cache de 64 Mo et lecture par projection mémoire (256 Mo)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -136,6 +168,27 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Use the URL below for Snapshot SDK. See https://guides.platerecognizer.com/docs/snapshot/getting-started/ for setup
 PLATE_RECOGNIZER_URL = 'http://localhost:8080/v1/plate-reader/'
 
+# Délais (connexion, lecture) en secondes
+PLATE_RECOGNIZER_TIMEOUT = (5, 30)
+# Nouvelles tentatives sur les réponses 429/5xx, avec une attente initiale doublée à chaque essai
+PLATE_RECOGNIZER_MAX_RETRIES = 5
+PLATE_RECOGNIZER_BACKOFF = 0.5
+# Nombre d'appels par seconde autorisés par le forfait (ex. 1 pour le forfait gratuit Snapshot Cloud)
+# None pour ne pas limiter (Snapshot SDK)
+PLATE_RECOGNIZER_RATE_LIMIT = None
+# Cache des reconnaissances, indexé par l'empreinte de l'image envoyée (taille max. en octets)
+PLATE_RECOGNIZER_CACHE_PATH = BASE_DIR / 'cache' / 'recognitions.sqlite3'
+PLATE_RECOGNIZER_CACHE_MAX_SIZE = 50 * 1024 * 1024
+# Envoi des images : 'multipart' (octets JPEG bruts) ou 'base64' (champ de formulaire, 33 % plus volumineux)
+PLATE_RECOGNIZER_UPLOAD_MODE = 'multipart'
+
+# Photos classées : format d'archivage (JPEG, WEBP ou AVIF), qualité de compression et rayon du flou des plaques
+# WEBP divise la taille des archives par 2 à 3 ; AVIF nécessite Pillow compilé avec libavif
+PHOTO_OUTPUT_FORMAT = 'JPEG'
+PHOTO_OUTPUT_QUALITY = 75
+PHOTO_OUTPUT_PROGRESSIVE = False
+PHOTO_BLUR_RADIUS = 6
+
 # Security files
 SECURITY_URL = '/security'
 SECURITY_ROOT = BASE_DIR / 'security'
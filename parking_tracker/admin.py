@@ -1,41 +1,137 @@
 from django.contrib import admin
-from .models import Vehicle, Batch, Photo, Park
+from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Vehicle, VehicleStats, Batch, Photo, Park, Checkpoint
+
+# Les listes ne comptent pas toute la table pour afficher le nombre total de résultats,
+# et les clés étrangères sont saisies par identifiant plutôt que dans une liste déroulante complète
 
 
 @admin.register(Vehicle)
 class VehicleAdmin(admin.ModelAdmin):
-    list_display = ['id', 'created']
-    search_fields = ['id']
+    list_display = ['id', 'created', 'total_parks', 'open_parks', 'last_seen']
+    list_select_related = ['stats']
+    search_fields = ['=id']
     readonly_fields = ['created']
+    date_hierarchy = 'created'
+    show_full_result_count = False
+
+    # Statistiques précalculées (VehicleStats), lues sans agréger l'historique
+    def total_parks(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return stats.total_parks if stats else 0
+
+    total_parks.short_description = 'Stationnements'
+    total_parks.admin_order_field = 'stats__total_parks'
+
+    def open_parks(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return stats.open_parks if stats else 0
+
+    open_parks.short_description = 'En cours'
+    open_parks.admin_order_field = 'stats__open_parks'
+
+    def last_seen(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return stats.last_seen if stats else None
+
+    last_seen.short_description = 'Vu pour la dernière fois'
+    last_seen.admin_order_field = 'stats__last_seen'
+
+
+@admin.register(VehicleStats)
+class VehicleStatsAdmin(admin.ModelAdmin):
+    list_display = ['vehicle', 'total_parks', 'open_parks', 'business_hours', 'longest_stay_days', 'last_seen',
+                    'last_arrival', 'updated']
+    list_select_related = ['vehicle']
+    search_fields = ['=vehicle__id']
+    readonly_fields = ['vehicle', 'total_parks', 'open_parks', 'business_minutes', 'longest_stay', 'last_seen',
+                       'last_arrival', 'updated']
+    show_full_result_count = False
+
+    def business_hours(self, obj):
+        return obj.business_hours_duration
+
+    business_hours.short_description = 'Durée ouvrée cumulée'
+    business_hours.admin_order_field = 'business_minutes'
+
+    def longest_stay_days(self, obj):
+        return obj.longest_stay_days
+
+    longest_stay_days.short_description = 'Plus long stationnement (jours)'
+    longest_stay_days.admin_order_field = 'longest_stay'
 
 
 @admin.register(Batch)
 class BatchAdmin(admin.ModelAdmin):
-    list_display = ['id', 'created', 'photo_count']
+    list_display = ['id', 'created', 'completed', 'photo_count']
+    list_filter = ['completed']
     readonly_fields = ['created']
+    date_hierarchy = 'created'
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Nombre de photos calculé par la base pour les seuls lots affichés (index photo_batch_vehicle_dt_idx)
+        photos = (Photo.objects.filter(batch=OuterRef('pk')).order_by().values('batch')
+                  .annotate(count=Count('id')).values('count'))
+        return super().get_queryset(request).annotate(photo_count=Coalesce(Subquery(photos), 0))
 
     def photo_count(self, obj):
-        return obj.photo_set.count()
+        return obj.photo_count
 
     photo_count.short_description = 'Nombre de photos'
+    photo_count.admin_order_field = 'photo_count'
 
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
     list_display = ['vehicle', 'batch', 'date_time', 'latitude', 'longitude', 'created']
-    list_filter = ['batch', 'vehicle', 'date_time']
-    search_fields = ['vehicle__id']
+    list_select_related = ['vehicle', 'batch']
+    search_fields = ['=vehicle__id', '=batch__id']
     readonly_fields = ['created']
+    raw_id_fields = ['vehicle', 'batch']
+    date_hierarchy = 'date_time'
+    show_full_result_count = False
+
+
+@admin.register(Checkpoint)
+class CheckpointAdmin(admin.ModelAdmin):
+    list_display = ['batch', 'file_name', 'state', 'photo', 'updated']
+    list_filter = ['state']
+    list_select_related = ['batch', 'photo']
+    search_fields = ['file_name', '=batch__id']
+    readonly_fields = ['updated']
+    raw_id_fields = ['batch', 'photo']
+    date_hierarchy = 'updated'
+    show_full_result_count = False
 
 
 @admin.register(Park)
 class ParkAdmin(admin.ModelAdmin):
     list_display = ['vehicle', 'arrival', 'departure', 'duration_days', 'is_current']
-    list_filter = ['arrival', 'departure', 'vehicle']
-    search_fields = ['vehicle__id']
+    list_filter = ['departure']
+    list_select_related = ['vehicle']
+    search_fields = ['=vehicle__id']
+    raw_id_fields = ['vehicle']
+    date_hierarchy = 'arrival'
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Durée calculée par la base, pour trier sans parcourir les stationnements en Python
+        end = Coalesce('departure', Value(timezone.now()))
+        return super().get_queryset(request).annotate(
+            duration=ExpressionWrapper(end - F('arrival'), output_field=DurationField())
+        )
+
+    def duration_days(self, obj):
+        return obj.duration.days + 1
+
+    duration_days.short_description = 'Durée (jours)'
+    duration_days.admin_order_field = 'duration'
 
     def is_current(self, obj):
         return obj.departure is None
 
     is_current.boolean = True
-    is_current.short_description = 'En cours'
\ No newline at end of file
+    is_current.short_description = 'En cours'
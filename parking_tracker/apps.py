@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 class ParkingTrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'parking_tracker'
 
+    def ready(self):
+        from .utils.database import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='parking_tracker_configure_sqlite')
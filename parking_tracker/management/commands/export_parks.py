@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from ...utils.export import (COLUMNS, EXPORT_FORMATS, PARQUET_AVAILABLE, export_data, export_queryset,
+                             iter_chunks)
+from ...utils.occupancy import parse_moment
+
+
+class Command(BaseCommand):
+    help = 'Export parks (with computed durations) or photos as CSV or Parquet, with constant memory usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=list(COLUMNS), default='parks', help='Data to export (default: parks)')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv',
+                            help='Output format (default: csv); parquet requires pyarrow')
+        parser.add_argument('--output', type=str, default=None,
+                            help='Output file (default: standard output, csv only)')
+        parser.add_argument('--start', type=str, default=None, help='Start date, YYYY-MM-DD or ISO 8601')
+        parser.add_argument('--end', type=str, default=None, help='End date, YYYY-MM-DD or ISO 8601')
+        parser.add_argument('--batch', type=int, default=None, help='Export only the data of this batch')
+        parser.add_argument('--after-batch', type=int, default=None,
+                            help='Export only the data of batches after this one (incremental export)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Number of rows read and written per chunk (default: 5000)')
+
+    def handle(self, *args, **options):
+        table = options['table']
+        export_format = options['format']
+        output = options['output']
+
+        if export_format == 'parquet' and not PARQUET_AVAILABLE:
+            self.stdout.write(self.style.ERROR('pyarrow n\'est pas installé : export Parquet indisponible.'))
+            return
+        if export_format == 'parquet' and not output:
+            self.stdout.write(self.style.ERROR('L\'export Parquet nécessite un fichier de sortie (--output).'))
+            return
+
+        try:
+            start = parse_moment(options['start'])
+            end = parse_moment(options['end'])
+        except ValueError as e:
+            self.stdout.write(self.style.ERROR(f'Date invalide : {e}.'))
+            return
+
+        queryset = export_queryset(table, start=start, end=end, batch=options['batch'],
+                                   after_batch=options['after_batch'])
+        chunk_size = max(1, options['chunk_size'])
+
+        rows = 0
+
+        def counted(chunks):
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        content = export_data(table, export_format, counted(iter_chunks(table, queryset, chunk_size)))
+
+        if output:
+            mode, encoding = ('wb', None) if export_format == 'parquet' else ('w', 'utf-8')
+            with open(output, mode, encoding=encoding, newline=None if encoding is None else '') as f:
+                for data in content:
+                    f.write(data)
+        else:
+            for data in content:
+                self.stdout.write(data, ending='')
+
+        self.stderr.write(f'📦 {rows} lignes exportées ({table}, {export_format}).')
@@ -0,0 +1,66 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from ...models import Park
+from ...utils.occupancy import PERIODS, occupancy_report, parse_moment
+
+
+class Command(BaseCommand):
+    help = 'Compute the street occupancy over time: occupancy per hour or day, peaks and weekday averages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=PERIODS, default='day', help='Bucket size (default: day)')
+        parser.add_argument('--start', type=str, default=None,
+                            help='Start date, YYYY-MM-DD or ISO 8601 (default: first arrival)')
+        parser.add_argument('--end', type=str, default=None, help='End date, YYYY-MM-DD or ISO 8601 (default: now)')
+        parser.add_argument('--peaks', type=int, default=5, help='Number of peaks to detect (default: 5)')
+        parser.add_argument('--format', choices=['text', 'json'], default='text', help='Output format (default: text)')
+        parser.add_argument('--output', type=str, default=None, help='Output file (default: standard output)')
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_moment(options['start'])
+            end = parse_moment(options['end'])
+        except ValueError as e:
+            self.stdout.write(self.style.ERROR(f'Date invalide : {e}.'))
+            return
+
+        started = time.perf_counter()
+        report = occupancy_report(Park.objects.all(), period=options['period'], start=start, end=end,
+                                  peaks=max(0, options['peaks']))
+        elapsed = time.perf_counter() - started
+
+        if options['format'] == 'json':
+            content = json.dumps(report, indent=2, ensure_ascii=False) + '\n'
+        else:
+            content = self.format_text(report)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(content)
+        else:
+            self.stdout.write(content, ending='')
+
+        self.stderr.write(f"📈 {report['parks']} stationnements analysés en {elapsed:.2f} s.")
+
+    def format_text(self, report):
+        """Rapport lisible : une ligne par période, puis les pics et les moyennes par jour de la semaine"""
+        lines = [
+            f"Occupation du {report['start']} au {report['end']} ({report['parks']} stationnements)",
+            '',
+            f"{'Période':<26} {'présents':>9} {'moyenne':>9} {'maximum':>9}",
+        ]
+        for bucket in report['buckets']:
+            lines.append(f"{bucket['start']:<26} {bucket['present']:>9} {bucket['average']:>9.2f} {bucket['peak']:>9}")
+
+        lines += ['', 'Pics d\'occupation :']
+        for peak in report['peaks']:
+            lines.append(f"  {peak['vehicles']} véhicules du {peak['start']} au {peak['end']}")
+
+        lines += ['', 'Moyenne par jour de la semaine :']
+        for weekday in report['weekdays']:
+            average = '-' if weekday['average'] is None else f"{weekday['average']:.2f}"
+            lines.append(f"  {weekday['weekday']:<10} {average:>9}")
+
+        return '\n'.join(lines) + '\n'
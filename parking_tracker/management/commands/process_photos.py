@@ -1,19 +1,42 @@
-import base64
+import cProfile
 import io
+import multiprocessing
 import os
+import pstats
 import re
+import shutil
+import threading
+import time
 import traceback
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 
-import requests
-from PIL import Image, ImageFilter
-from PIL.ExifTags import TAGS, GPSTAGS
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, Max, Min, OuterRef
 from django.utils import timezone
 
-from ...models import Vehicle, Batch, Photo, Park
+from ...models import Vehicle, VehicleStats, Batch, Photo, Park, Checkpoint
+from ...utils.anonymize import OUTPUT_FORMATS, check_output_format
+from ...utils.cache import RecognitionCache
+from ...utils.exif import read_metadata
+from ...utils.imaging import archive_photo, prepare_photo, run_inline
+from ...utils.metrics import Metrics, timed_call
+from ...utils.recognizer import PlateRecognizerClient, PlateRecognizerError
 from ...utils.rgpd import RGPD
+from ...utils.stats import closed_park_totals
+from ...utils.watcher import DirectoryWatcher
+
+
+# Nombre de photos à partir duquel le pool de processus est démarré automatiquement (--cpu-workers 0).
+# Démarrer un processus (spawn) coûte environ 0,2 s, autant que préparer une photo de 12 Mpx :
+# en dessous, les petits lots et les cycles de surveillance sont traités plus vite sur place.
+CPU_POOL_MIN_PHOTOS = 16
+
+# Nombre de fichiers par requête sur le journal des lots (limite de paramètres SQL)
+CHECKPOINT_QUERY_SIZE = 500
 
 
 class Command(BaseCommand):
@@ -23,12 +46,65 @@ class Command(BaseCommand):
         parser.add_argument('--input-dir', type=str, required=True, help='Input directory with photos')
         parser.add_argument('--output-dir', type=str, required=True, help='Output directory for sorted photos')
         parser.add_argument('--api-key', type=str, required=True, help='PlateRecognizer API key')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of concurrent PlateRecognizer calls (default: 1, serial)')
+        parser.add_argument('--cpu-workers', type=int, default=0,
+                            help='Number of processes for decoding, resizing, blurring and encoding photos '
+                                 f'(default: 0, one per CPU once {CPU_POOL_MIN_PHOTOS} photos are to be processed '
+                                 'at once; 1 to stay in-process)')
+        parser.add_argument('--rate-limit', type=float, default=None,
+                            help='Max PlateRecognizer calls per second (default: settings.PLATE_RECOGNIZER_RATE_LIMIT)')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Do not read or store PlateRecognizer results in the local cache')
+        parser.add_argument('--resume', action='store_true',
+                            help='Resume the last interrupted batch from its checkpoints')
+        parser.add_argument('--quarantine-dir', type=str, default=None,
+                            help='Directory for photos that fail processing (default: OUTPUT_DIR/quarantine)')
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Number of recognized photos stored per database transaction (default: 100)')
+        parser.add_argument('--output-format', type=str.upper, choices=list(OUTPUT_FORMATS), default=None,
+                            help='Format of sorted photos (default: settings.PHOTO_OUTPUT_FORMAT)')
+        parser.add_argument('--output-quality', type=int, default=None,
+                            help='Compression quality of sorted photos, 1-100 (default: settings.PHOTO_OUTPUT_QUALITY)')
+        parser.add_argument('--plan', action='store_true',
+                            help='Only pre-scan the photo metadata and print the processing plan, without any API call')
+        parser.add_argument('--metrics-file', type=str, default=None,
+                            help='Write per-stage timings and counters to this file: JSON if it ends with .json, '
+                                 'Prometheus text format otherwise (e.g. for the node_exporter textfile collector)')
+        parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], default=None,
+                            help='Profile the run with cProfile or pyinstrument (if installed)')
+        parser.add_argument('--profile-output', type=str, default=None,
+                            help='Profile output file (default: process_photos.prof for cProfile, none for pyinstrument)')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep watching the input directory and process photos as they arrive')
+        parser.add_argument('--idle-timeout', type=float, default=300,
+                            help='In watch mode, close the current batch after this many idle seconds (default: 300)')
+        parser.add_argument('--settle-time', type=float, default=2,
+                            help='In watch mode, seconds a file must stay unchanged before processing (default: 2)')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help='In watch mode, seconds between two directory scans (default: 5)')
 
     def handle(self, *args, **options):
-        input_dir = options['input_dir']
-        output_dir = options['output_dir']
+        self.input_dir = options['input_dir']
+        self.output_dir = options['output_dir']
+        self.workers = max(1, options['workers'])
+        self.cpu_workers_option = max(0, options['cpu_workers'])
+        self.quarantine_dir = options['quarantine_dir'] or os.path.join(self.output_dir, 'quarantine')
+        self.chunk_size = max(1, options['chunk_size'])
+        self.metrics_file = options['metrics_file']
+        self.metrics = Metrics('process_photos')
         api_key = options['api_key']
 
+        try:
+            self.output_format = check_output_format(
+                options['output_format'] or getattr(settings, 'PHOTO_OUTPUT_FORMAT', 'JPEG'))
+        except ValueError as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            return
+        self.output_quality = options['output_quality'] or getattr(settings, 'PHOTO_OUTPUT_QUALITY', 75)
+        self.output_progressive = getattr(settings, 'PHOTO_OUTPUT_PROGRESSIVE', False)
+        self.blur_radius = getattr(settings, 'PHOTO_BLUR_RADIUS', 6)
+
         # Vérifier qu'il y a bien une clé publique, mais pas de clé privée
         if os.path.exists(settings.SECURITY_PRIVATE_KEY_URL):
             self.stdout.write(self.style.ERROR(
@@ -36,7 +112,7 @@ class Command(BaseCommand):
             quit()
 
         try:
-            public_key_pem = RGPD.load_key_from_file(settings.SECURITY_PUBLIC_KEY_URL)
+            self.rgpd = RGPD.from_public_key_file(settings.SECURITY_PUBLIC_KEY_URL)
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Erreur avec la clé de chiffrement public {e}'))
             self.stdout.write(self.style.ERROR(
@@ -45,181 +121,665 @@ class Command(BaseCommand):
                 f'Pour créer des clés, utilisez la commande python manage.py make_keys --password VOTRE_MOT_DE_PASSE_SECRET'))
             quit()
 
-        # Vérifier si le dossier d'entrée contient des photos
-        photo_files = [f for f in os.listdir(input_dir) if f.lower().endswith(('.jpg', '.jpeg'))]
+        # Reprendre le dernier lot interrompu
+        interrupted = Batch.objects.filter(completed=False).first()
+        batch = None
+        if options['resume']:
+            if interrupted is None:
+                self.stdout.write(self.style.ERROR('Aucun lot interrompu à reprendre.'))
+                return
+            batch = interrupted
+            self.stdout.write(self.style.SUCCESS(f'Reprise du batch: {batch.id}'))
+        elif interrupted is not None:
+            self.stdout.write(self.style.WARNING(
+                f'Le batch {interrupted.id} a été interrompu, utilisez --resume pour le reprendre.'))
+
+        cache = None
+        if not options['no_cache']:
+            cache = RecognitionCache(settings.PLATE_RECOGNIZER_CACHE_PATH, settings.PLATE_RECOGNIZER_CACHE_MAX_SIZE)
+
+        self.client = PlateRecognizerClient(api_key, rate_limit=options['rate_limit'],
+                                            pool_size=max(10, self.workers), cache=cache)
+        # Au plus `workers` appels simultanés à l'API, même si davantage de photos sont en préparation
+        self.api_slots = threading.BoundedSemaphore(self.workers)
+
+        # Traitements d'image (CPU) sur place, ou dans des processus dédiés à côté des appels réseau
+        self.cpu_workers = 1
+        self.cpu_pool = None
+        # Photos dont la reconnaissance a échoué faute d'API, à retenter au prochain passage
+        self.postponed = set()
+        if self.cpu_workers_option > 1:
+            self.start_cpu_pool(self.cpu_workers_option)
+
+        profiler = self.start_profiler(options['profile'])
+        try:
+            # Requêtes SQL du processus principal, seul à accéder à la base
+            with connection.execute_wrapper(self.count_query):
+                self.run(batch, options)
+        finally:
+            self.client.close()
+            if self.cpu_pool is not None:
+                self.cpu_pool.shutdown(cancel_futures=True)
+            if profiler is not None:
+                self.stop_profiler(profiler, options['profile'], options['profile_output'])
+            self.report_metrics()
+
+    def run(self, batch, options):
+        """Traite les photos du dossier d'entrée, une fois ou en continu"""
+        if options['watch']:
+            self.watch(batch, options['idle_timeout'], options['settle_time'], options['poll_interval'])
+            return
+
+        # Photos du dossier d'entrée et de ses sous-dossiers, triées par date de prise de vue
+        entries = self.read_entries(
+            (photo_file, photo_path) for photo_file, photo_path, stat in self.scan_photos()
+        )
 
-        if not photo_files:
+        if options['plan']:
+            self.print_plan(entries)
+            return
+
+        if not entries and batch is None:
             self.stdout.write(self.style.SUCCESS('Aucune photo à traiter'))
             return
 
-        # Initialise le lot à blanc
-        batch = None
+        if batch is None:
+            batch = self.create_batch()
 
-        # Traiter chaque photo
-        processed_vehicles = set()
+        self.process_photos(batch, entries)
+        self.close_batch(batch)
 
-        for photo_file in photo_files:
-            photo_path = os.path.join(input_dir, photo_file)
+        if self.postponed:
+            self.stdout.write(self.style.WARNING(
+                f'{len(self.postponed)} photos laissées dans le dossier d\'entrée, à traiter lors du prochain lancement.'))
+
+    def start_cpu_pool(self, workers):
+        """Démarre le pool de processus des traitements d'image"""
+        self.cpu_workers = workers
+        self.cpu_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def plan_cpu_pool(self, photo_count):
+        """
+        En mode automatique, démarre le pool de processus dès qu'assez de photos sont à traiter en une fois
+        (CPU_POOL_MIN_PHOTOS) ; il est ensuite conservé jusqu'à la fin de la commande
+        """
+        cpu_count = os.cpu_count() or 1
+        if (self.cpu_pool is None and self.cpu_workers_option == 0 and cpu_count > 1
+                and photo_count >= CPU_POOL_MIN_PHOTOS):
+            self.start_cpu_pool(cpu_count)
+
+    def count_query(self, execute, sql, params, many, context):
+        self.metrics.count('db_queries')
+        return execute(sql, params, many, context)
+
+    def start_profiler(self, profile):
+        """Démarre le profileur demandé (seul le thread principal est profilé par cProfile)"""
+        if profile == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+
+        if profile == 'pyinstrument':
             try:
-                # Extraire les métadonnées EXIF
-                exif_data = self.extract_exif(photo_path)
+                from pyinstrument import Profiler
+            except ImportError:
+                self.stdout.write(self.style.WARNING('pyinstrument n\'est pas installé, profilage désactivé.'))
+                return None
+            profiler = Profiler()
+            profiler.start()
+            return profiler
 
-                # Reconnaître la plaque d'immatriculation
-                results = self.recognize_plate(photo_path, api_key)
+        return None
 
-                if results and results['plate']:
-                    # Crée un nouveau Batch
+    def stop_profiler(self, profiler, profile, output):
+        """Arrête le profileur, affiche les fonctions les plus coûteuses et enregistre le profil"""
+        if profile == 'cprofile':
+            profiler.disable()
+            output = output or 'process_photos.prof'
+            profiler.dump_stats(output)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(20)
+            self.stdout.write(stream.getvalue())
+        else:
+            profiler.stop()
+            self.stdout.write(profiler.output_text())
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+
+        if output:
+            self.stdout.write(self.style.SUCCESS(f'Profil enregistré dans {output}'))
+
+    def report_metrics(self):
+        """Affiche le temps passé dans chaque étape et écrit le fichier de métriques"""
+        self.update_metrics()
+        summary = self.metrics.summary()
+        if not summary['stages']:
+            return
+
+        self.stdout.write(f"{'Étape':<10} {'appels':>7} {'total (s)':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+        for stage, values in summary['stages'].items():
+            self.stdout.write(f"{stage:<10} {values['count']:>7} {values['total_seconds']:>10.2f} "
+                              f"{values['p50_seconds'] * 1000:>9.1f} {values['p95_seconds'] * 1000:>9.1f}")
+
+        counters = summary['counters']
+        self.stdout.write(', '.join(f'{name}: {value}' for name, value in counters.items()))
+
+        if self.metrics_file:
+            self.metrics.write(self.metrics_file)
+
+    def update_metrics(self):
+        """Reporte dans les métriques les compteurs du client de l'API et du cache"""
+        self.metrics.set('api_retries', self.client.retries)
+        if self.client.cache is not None:
+            self.metrics.set('cache_hits', self.client.cache.hits)
+            self.metrics.set('cache_misses', self.client.cache.misses)
+
+        counters = self.metrics.summary()['counters']
+        if counters.get('photos_scanned'):
+            self.metrics.set('queries_per_photo', round(counters.get('db_queries', 0) / counters['photos_scanned'], 3))
+
+    def watch(self, batch, idle_timeout, settle_time, poll_interval):
+        """
+        Surveille le dossier d'entrée et traite les photos au fil de leur arrivée.
+        Une photo n'est traitée qu'une fois sa taille stable ; le lot est clôturé
+        après `idle_timeout` secondes sans nouvelle photo.
+        """
+        watcher = DirectoryWatcher(self.input_dir)
+        self.stdout.write(self.style.SUCCESS(
+            f'Surveillance de {self.input_dir} ({watcher.mode}), Ctrl+C pour arrêter.'))
+
+        # Taille et date de modification de chaque fichier au passage précédent
+        observed = {}
+        # Fichiers déjà traités (ou laissés sans plaque), à ne pas retraiter tant qu'ils ne changent pas
+        handled = set()
+        last_activity = time.monotonic()
+        # Vrai pendant le traitement d'un passage : une interruption y laisse le lot à reprendre
+        in_cycle = False
+
+        try:
+            while True:
+                now = time.time()
+                ready = []
+                current = {}
+
+                present = set()
+
+                for photo_file, photo_path, stat in self.scan_photos():
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    current[photo_path] = signature
+                    present.add((photo_file, signature))
+                    if (photo_file, signature) in handled:
+                        continue
+
+                    # Fichier encore en cours d'écriture : attendre qu'il ne change plus
+                    if observed.get(photo_path) == signature and now - stat.st_mtime >= settle_time:
+                        ready.append((photo_file, photo_path, signature))
+
+                observed = current
+                # Les fichiers archivés ou mis en quarantaine ont quitté le dossier : inutile de s'en souvenir
+                handled &= present
+
+                if ready:
                     if batch is None:
-                        batch = Batch.objects.create()
-                        self.stdout.write(self.style.SUCCESS(f'Nouveau batch créé: {batch.id}'))
+                        batch = self.create_batch()
+                    in_cycle = True
+                    self.process_photos(batch, self.read_entries((f, p) for f, p, s in ready))
+                    in_cycle = False
+                    handled.update((photo_file, signature) for photo_file, photo_path, signature in ready
+                                   if photo_file not in self.postponed)
+                    self.postponed.clear()
+                    last_activity = time.monotonic()
+                elif batch is not None and time.monotonic() - last_activity >= idle_timeout:
+                    self.close_batch(batch)
+                    batch = None
+
+                watcher.wait(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Arrêt de la surveillance.'))
+            if batch is not None and in_cycle:
+                # Photos enregistrées mais pas encore classées : le lot reste ouvert pour --resume
+                self.stdout.write(self.style.WARNING(
+                    f'Le batch {batch.id} a été interrompu, utilisez --resume pour le reprendre.'))
+            elif batch is not None:
+                self.close_batch(batch)
+        finally:
+            watcher.stop()
+
+    def create_batch(self):
+        """Crée un nouveau lot, marqué non terminé jusqu'à sa clôture"""
+        batch = Batch.objects.create(completed=False)
+        self.stdout.write(self.style.SUCCESS(f'Nouveau batch créé: {batch.id}'))
+        return batch
+
+    def close_batch(self, batch):
+        """Met à jour les stationnements et clôture le lot, ou l'abandonne s'il ne contient aucune photo"""
+        vehicle_count = Photo.objects.filter(batch=batch).values('vehicle').distinct().count()
+
+        if vehicle_count:
+            with transaction.atomic(), self.metrics.timer('parks'):
+                self.update_parking_records(batch)
+                batch.completed = True
+                batch.save(update_fields=['completed'])
+        else:
+            batch.delete()
 
-                    plate_number = self.format_plate(results['plate'])
-                    finger_print = RGPD.generate_fingerprint(plate_number, public_key_pem)
+        self.stdout.write(self.style.SUCCESS(f'Traitement terminé. {vehicle_count} véhicules traités.'))
 
-                    # Créer ou récupérer le véhicule
-                    vehicle, created = Vehicle.objects.get_or_create(finger_print=finger_print)
+        # En mode surveillance, les métriques sont mises à jour à chaque lot
+        if self.metrics_file:
+            self.update_metrics()
+            self.metrics.write(self.metrics_file)
 
-                    if created:
-                        # Enregistre une version chiffrée de la plaque d'immatriculation
-                        vehicle.encoded_plate = RGPD.encrypt_text(plate_number, public_key_pem)
-                        vehicle.save()
-                        self.stdout.write(f'Nouveau véhicule: {plate_number}')
+    def scan_photos(self, directory=None):
+        """
+        Parcourt récursivement le dossier d'entrée (sous-dossiers datés compris) et génère
+        pour chaque photo un tuple (chemin relatif, chemin complet, os.stat_result)
+        """
+        directory = directory or self.input_dir
+        excluded = {os.path.realpath(self.output_dir), os.path.realpath(self.quarantine_dir)}
+
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.realpath(entry.path) not in excluded:
+                        yield from self.scan_photos(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg')):
+                    yield os.path.relpath(entry.path, self.input_dir), entry.path, entry.stat()
+
+    def read_entries(self, photos):
+        """
+        Lit les métadonnées EXIF de chaque photo et renvoie la liste des tuples
+        (chemin relatif, chemin complet, exif_data) triée par date de prise de vue.
+        exif_data vaut None si la lecture a échoué : l'erreur sera relevée lors du traitement.
+        """
+        entries = []
+        for photo_file, photo_path in photos:
+            self.metrics.count('photos_scanned')
+            try:
+                with self.metrics.timer('exif'):
+                    exif_data = self.extract_exif(photo_path)
+            except Exception:
+                exif_data = None
+            entries.append((photo_file, photo_path, exif_data))
+
+        def capture_time(entry):
+            photo_file, photo_path, exif_data = entry
+            if exif_data and exif_data.get('datetime'):
+                return exif_data['datetime'], photo_file
+            return self.file_datetime(photo_path), photo_file
+
+        return sorted(entries, key=capture_time)
+
+    def print_plan(self, entries):
+        """Affiche ce que traiterait la commande, d'après les seules métadonnées des photos"""
+        readable = [entry for entry in entries if entry[2] is not None]
+        self.stdout.write(f'{len(entries)} photos à traiter, {len(entries) - len(readable)} illisibles.')
+        if not readable:
+            return
 
-                    # Créer l'enregistrement Photo
-                    photo = Photo.objects.create(
-                        vehicle=vehicle,
-                        batch=batch,
-                        date_time=exif_data['datetime'],
-                        latitude=exif_data.get('latitude'),
-                        longitude=exif_data.get('longitude')
-                    )
+        first, last = readable[0][2]['datetime'], readable[-1][2]['datetime']
+        with_gps = sum(1 for entry in readable if entry[2]['latitude'] is not None)
+        self.stdout.write(f'Prises de vue du {timezone.localtime(first):%d/%m/%Y %H:%M} '
+                          f'au {timezone.localtime(last):%d/%m/%Y %H:%M}, {with_gps} avec coordonnées GPS.')
 
-                    # Classer la photo
-                    self.organize_photo(photo_path, output_dir, results['resized_img'], results['box'], vehicle.id, photo.id,
-                                        exif_data['datetime'], )
+        folders = {}
+        for photo_file, photo_path, exif_data in entries:
+            folder = os.path.dirname(photo_file) or '.'
+            folders[folder] = folders.get(folder, 0) + 1
+        for folder, count in sorted(folders.items()):
+            self.stdout.write(f'  {folder} : {count} photos')
 
-                    processed_vehicles.add(finger_print)
-                    self.stdout.write(f'Photo traitée: {plate_number}')
+    def process_photos(self, batch, entries):
+        """
+        Reconnaît, enregistre et classe une série de photos dans un lot.
+        Renvoie l'ensemble des empreintes des véhicules traités.
+        """
+        self.plan_cpu_pool(len(entries))
+        checkpoints = self.load_checkpoints(batch, [(photo_file, photo_path) for photo_file, photo_path, exif_data in entries])
+        processed_vehicles = set()
 
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Erreur lors du traitement de {photo_file}.'))
-                traceback.print_exc()
-                quit()
+        # Les reconnaissances peuvent être concurrentes, mais les résultats sont consommés
+        # dans l'ordre des fichiers : les écritures en base restent identiques à un traitement séquentiel
+        recognitions = self.iter_recognitions(entries)
 
-        # Mettre à jour les stationnements
-        if batch:
-            self.update_parking_records(batch, processed_vehicles)
+        # Les photos reconnues sont enregistrées en base par paquets
+        pending = []
 
-        self.stdout.write(self.style.SUCCESS(f'Traitement terminé. {len(processed_vehicles)} véhicules traités.'))
+        for photo_file, photo_path, outcome in recognitions:
+            checkpoint = checkpoints[photo_file]
+            try:
+                exif_data, results = outcome()
+                checkpoint.state = Checkpoint.RECOGNIZED
 
-    def extract_exif(self, photo_path):
-        """Extrait les données EXIF d'une photo"""
-        with Image.open(photo_path) as img:
-            exif_dict = img._getexif()
-
-            if exif_dict is None:
-                # Utiliser la date de modification du fichier si pas d'EXIF
-                stat = os.stat(photo_path)
-                return {
-                    'datetime': datetime.fromtimestamp(stat.st_mtime),
-                    'latitude': None,
-                    'longitude': None
-                }
-
-            exif_data = {}
-
-            # Extraire la date/heure
-            for tag, value in exif_dict.items():
-                tag_name = TAGS.get(tag, tag)
-                if tag_name == 'DateTime':
-                    exif_data['datetime'] = self.process_exif_datetime(value)
-                elif tag_name == 'GPSInfo':
-                    gps_data = {}
-                    for gps_tag in value:
-                        gps_tag_name = GPSTAGS.get(gps_tag, gps_tag)
-                        gps_data[gps_tag_name] = value[gps_tag]
-
-                    # Convertir les coordonnées GPS
-                    if 'GPSLatitude' in gps_data and 'GPSLongitude' in gps_data:
-                        lat = self.convert_gps_coordinate(gps_data['GPSLatitude'], gps_data.get('GPSLatitudeRef', 'N'))
-                        lon = self.convert_gps_coordinate(gps_data['GPSLongitude'],
-                                                          gps_data.get('GPSLongitudeRef', 'E'))
-                        exif_data['latitude'] = lat
-                        exif_data['longitude'] = lon
-
-            # Utiliser la date de modification si pas de date EXIF
-            if 'datetime' not in exif_data:
-                stat = os.stat(photo_path)
-                exif_data['datetime'] = datetime.fromtimestamp(stat.st_mtime)
-
-            return exif_data
-
-    def process_exif_datetime(self, exif_datetime_str):
-        """
-        Traite spécifiquement les données datetime des EXIF.
-        Les photos ont généralement l'heure locale où elles ont été prises.
-        """
-        if not exif_datetime_str:
+                if results and results['plate']:
+                    self.metrics.count('photos_recognized')
+                    plate_number = self.format_plate(results['plate'])
+                    pending.append({
+                        'photo_file': photo_file,
+                        'photo_path': photo_path,
+                        'checkpoint': checkpoint,
+                        'exif_data': exif_data,
+                        'results': results,
+                        'plate_number': plate_number,
+                        'finger_print': self.rgpd.fingerprint(plate_number),
+                        # Photo déjà enregistrée avant une interruption
+                        'stored': checkpoint.photo_id is not None,
+                    })
+                else:
+                    self.metrics.count('photos_without_plate')
+                    self.set_checkpoint(checkpoint, Checkpoint.RECOGNIZED)
+
+            except PlateRecognizerError as e:
+                # API indisponible : la photo reste dans le dossier d'entrée, en attente d'un prochain passage
+                self.stdout.write(self.style.ERROR(f'{photo_file} non reconnue ({e}), photo laissée en attente.'))
+                self.metrics.count('photos_postponed')
+                self.postponed.add(photo_file)
+                self.set_checkpoint(checkpoint, Checkpoint.PENDING, error=str(e))
+
+            except Exception:
+                self.fail_photo(photo_file, photo_path, checkpoint)
+
+            if len(pending) >= self.chunk_size:
+                processed_vehicles |= self.process_chunk(batch, pending)
+                pending = []
+
+        if pending:
+            processed_vehicles |= self.process_chunk(batch, pending)
+
+        return processed_vehicles
+
+    def process_chunk(self, batch, items):
+        """
+        Enregistre un paquet de photos reconnues puis les classe.
+        Renvoie l'ensemble des empreintes des véhicules traités.
+        """
+        try:
+            self.store_photos(batch, items)
+        except Exception:
+            if len(items) == 1:
+                item = items[0]
+                self.fail_photo(item['photo_file'], item['photo_path'], item['checkpoint'])
+                return set()
+
+            # Rejouer photo par photo pour n'écarter que celle qui pose problème
+            processed_vehicles = set()
+            for item in items:
+                processed_vehicles |= self.process_chunk(batch, [item])
+            return processed_vehicles
+
+        # Classer les photos : les archives, déjà floutées et encodées, n'ont plus qu'à être écrites
+        finished = [self.finish_photo(item) for item in items]
+
+        moved = [item for item in finished if item is not None]
+        self.save_checkpoints([item['checkpoint'] for item in moved])
+        return {item['finger_print'] for item in moved}
+
+    def finish_photo(self, item):
+        """
+        Écrit l'archive d'une photo enregistrée puis supprime l'original.
+        Renvoie l'élément si la photo a été classée, None si elle a été mise en quarantaine.
+        """
+        photo = item['checkpoint'].photo
+        try:
+            self.organize_photo(item['results']['archive'], photo.vehicle_id, photo.id, item['exif_data']['datetime'])
+            # Supprime l'image d'origine
+            os.remove(item['photo_path'])
+        except Exception:
+            self.fail_photo(item['photo_file'], item['photo_path'], item['checkpoint'])
             return None
 
-        # Convertir la chaîne en datetime naïf
-        naive_dt = datetime.strptime(exif_datetime_str, '%Y:%m:%d %H:%M:%S')
-
-        # Utiliser la timezone configurée dans Django
-        # (qui correspond à votre timezone locale Europe/Paris)
-        aware_dt = timezone.make_aware(naive_dt)
+        item['checkpoint'].state = Checkpoint.MOVED
+        self.metrics.count('photos_moved')
+        self.stdout.write(f'Photo traitée: {item["plate_number"]}')
+        return item
 
-        return aware_dt
+    def store_photos(self, batch, items):
+        """
+        Crée en une transaction les véhicules inconnus et les photos d'un paquet,
+        avec une requête de résolution des empreintes et des insertions groupées
+        """
+        with transaction.atomic(), self.metrics.timer('store'):
+            finger_prints = {item['finger_print'] for item in items}
+            vehicles = {
+                vehicle.finger_print: vehicle
+                for vehicle in Vehicle.objects.filter(finger_print__in=finger_prints)
+            }
+
+            # Véhicules inconnus, dans l'ordre de leur première apparition
+            new_vehicles = []
+            for item in items:
+                finger_print = item['finger_print']
+                if finger_print not in vehicles:
+                    # Enregistre une version chiffrée de la plaque d'immatriculation
+                    vehicle = Vehicle(finger_print=finger_print,
+                                      encoded_plate=self.rgpd.encrypt(item['plate_number']))
+                    vehicles[finger_print] = vehicle
+                    new_vehicles.append(vehicle)
+                    self.stdout.write(f'Nouveau véhicule: {item["plate_number"]}')
+
+            Vehicle.objects.bulk_create(new_vehicles)
+            if new_vehicles and not connection.features.can_return_rows_from_bulk_insert:
+                # Base sans INSERT ... RETURNING (SQLite < 3.35) : relire les identifiants par empreinte
+                created = Vehicle.objects.in_bulk([vehicle.finger_print for vehicle in new_vehicles],
+                                                  field_name='finger_print')
+                for vehicle in new_vehicles:
+                    vehicle.pk = created[vehicle.finger_print].pk
+
+            # Photos déjà enregistrées avant une interruption : il ne reste qu'à les classer
+            new_photos = []
+            for item in items:
+                if item['stored']:
+                    continue
+
+                checkpoint = item['checkpoint']
+                exif_data = item['exif_data']
+                checkpoint.photo = Photo(
+                    vehicle=vehicles[item['finger_print']],
+                    batch=batch,
+                    date_time=exif_data['datetime'],
+                    latitude=exif_data.get('latitude'),
+                    longitude=exif_data.get('longitude')
+                )
+                checkpoint.state = Checkpoint.STORED
+                new_photos.append(checkpoint.photo)
+
+            Photo.objects.bulk_create(new_photos)
+            if new_photos and not connection.features.can_return_rows_from_bulk_insert:
+                # Les écritures étant sérialisées dans la transaction, les dernières photos du lot
+                # sont celles qui viennent d'être insérées, dans l'ordre
+                ids = Photo.objects.filter(batch=batch).order_by('-id').values_list('id', flat=True)[:len(new_photos)]
+                for photo, photo_id in zip(new_photos, reversed(list(ids))):
+                    photo.pk = photo_id
+            self.metrics.count('photos_stored', len(new_photos))
+            self.save_checkpoints([item['checkpoint'] for item in items])
+
+    def fail_photo(self, photo_file, photo_path, checkpoint):
+        """Met une photo en échec en quarantaine et le consigne dans le journal"""
+        self.stdout.write(self.style.ERROR(f'Erreur lors du traitement de {photo_file}, photo mise en quarantaine.'))
+        self.metrics.count('photos_failed')
+        traceback.print_exc()
+        self.quarantine_photo(photo_file, photo_path)
+        self.set_checkpoint(checkpoint, Checkpoint.FAILED, error=traceback.format_exc())
+
+    def load_checkpoints(self, batch, photos):
+        """
+        Renvoie le journal du lot pour chaque photo, en créant les entrées manquantes.
+        Si le fichier a changé depuis son entrée (fichier remplacé sous le même nom), l'entrée est remise
+        à zéro : la nouvelle photo est reconnue et enregistrée comme une autre.
 
-    def convert_gps_coordinate(self, coordinate, ref):
-        """Convertit les coordonnées GPS en degrés décimaux"""
-        degrees = float(coordinate[0])
-        minutes = float(coordinate[1])
-        seconds = float(coordinate[2])
+        Args:
+            photos (list): Tuples (chemin relatif, chemin complet)
+        """
+        signatures = {photo_file: self.file_signature(photo_path) for photo_file, photo_path in photos}
+        checkpoints = self.fetch_checkpoints(batch, list(signatures))
+
+        missing = [photo_file for photo_file in signatures if photo_file not in checkpoints]
+        Checkpoint.objects.bulk_create(
+            [Checkpoint(batch=batch, file_name=photo_file, signature=signatures[photo_file]) for photo_file in missing],
+            batch_size=CHECKPOINT_QUERY_SIZE,
+        )
+        checkpoints.update(self.fetch_checkpoints(batch, missing))
+
+        changed = []
+        for photo_file, signature in signatures.items():
+            checkpoint = checkpoints[photo_file]
+            if checkpoint.signature == signature:
+                continue
+            if checkpoint.signature:
+                checkpoint.state = Checkpoint.PENDING
+                checkpoint.photo = None
+                checkpoint.error = ''
+            checkpoint.signature = signature
+            checkpoint.updated = timezone.now()
+            changed.append(checkpoint)
+        Checkpoint.objects.bulk_update(changed, ['signature', 'state', 'photo', 'error', 'updated'])
+
+        return checkpoints
+
+    @staticmethod
+    def fetch_checkpoints(batch, photo_files):
+        """
+        Lit le journal du lot pour ces seuls fichiers, par paquets pour rester sous la limite de paramètres SQL
 
-        decimal = degrees + minutes / 60 + seconds / 3600
+        Returns:
+            dict: Entrées Checkpoint, indexées par chemin relatif
+        """
+        checkpoints = {}
+        for start in range(0, len(photo_files), CHECKPOINT_QUERY_SIZE):
+            checkpoints.update(
+                (checkpoint.file_name, checkpoint)
+                for checkpoint in Checkpoint.objects.filter(
+                    batch=batch, file_name__in=photo_files[start:start + CHECKPOINT_QUERY_SIZE]
+                ).select_related('photo')
+            )
+        return checkpoints
 
-        if ref in ['S', 'W']:
-            decimal = -decimal
+    @staticmethod
+    def file_signature(photo_path):
+        """Taille et date de modification d'un fichier, pour savoir s'il a été remplacé"""
+        try:
+            stat = os.stat(photo_path)
+        except OSError:
+            return ''
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    def set_checkpoint(self, checkpoint, state, **fields):
+        """Enregistre le nouvel état d'une photo dans le journal"""
+        checkpoint.state = state
+        for name, value in fields.items():
+            setattr(checkpoint, name, value)
+        checkpoint.save(update_fields=['state', 'updated', *fields])
+
+    def save_checkpoints(self, checkpoints):
+        """Enregistre en une requête groupée l'état de plusieurs entrées du journal"""
+        now = timezone.now()
+        for checkpoint in checkpoints:
+            checkpoint.updated = now
+        Checkpoint.objects.bulk_update(checkpoints, ['state', 'photo', 'updated'])
+
+    def quarantine_photo(self, photo_file, photo_path):
+        """Déplace une photo en échec dans le dossier de quarantaine, en conservant ses sous-dossiers"""
+        if not os.path.exists(photo_path):
+            return
 
-        return decimal
+        quarantine_path = os.path.join(self.quarantine_dir, photo_file)
+        os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+        shutil.move(photo_path, quarantine_path)
 
-    def image_to_base64(self, image, format='JPEG', quality=85):
+    def analyze_photo(self, photo_path, exif_data):
+        """
+        Reconnaît la plaque d'une photo, dont les métadonnées EXIF ont déjà été lues si possible,
+        et prépare son archive floutée. La photo est décodée une seule fois, à taille réduite, dans le pool de processus.
+        """
+        image_bytes, pixels = self.submit_cpu('prepare', prepare_photo, photo_path).result()
+        if exif_data is None:
+            exif_data = self.extract_exif(photo_path)
+
+        with self.api_slots:
+            results = self.recognize_plate(image_bytes, self.client)
+        if results and results['plate']:
+            # Floutage et encodage de l'archive dès que les plaques sont connues, à partir des pixels de l'image
+            # réduite (sans recompresser le JPEG envoyé) : seul le fichier compressé attend l'enregistrement du paquet
+            results['archive'] = self.submit_cpu(
+                'archive', archive_photo, pixels, results['boxes'], self.output_format, self.output_quality,
+                self.output_progressive, self.blur_radius,
+            ).result()
+        return exif_data, results
+
+    def submit_cpu(self, stage, fn, *args):
         """
-        Convertit une image PIL en string base64.
+        Confie un traitement d'image au pool de processus, ou l'exécute sur place sans pool.
+        Sa durée, mesurée dans le processus de travail (hors attente), est enregistrée pour l'étape donnée.
         """
-        buffer = io.BytesIO()
-        image.save(buffer, format=format, quality=quality)
-        buffer.seek(0)
+        if self.cpu_pool is None:
+            task = run_inline(timed_call, fn, *args)
+        else:
+            task = self.cpu_pool.submit(timed_call, fn, *args)
+
+        future = Future()
 
-        # Encoder en base64
-        img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-        return img_base64
+        def done(task):
+            try:
+                result, seconds = task.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            self.metrics.observe(stage, seconds)
+            future.set_result(result)
 
-    def resize_image_keep_ratio(self, image, max_width=1980, max_height=1080):
+        task.add_done_callback(done)
+        return future
+
+    def iter_recognitions(self, entries):
         """
-        Redimensionne une image en conservant le ratio largeur:hauteur
-        pour qu'elle tienne dans les dimensions maximales spécifiées.
+        Génère, dans l'ordre des photos, un tuple (photo_file, photo_path, outcome)
+        où outcome() renvoie (exif_data, results) ou lève l'exception rencontrée.
+        Avec plusieurs workers, au plus `workers` appels à l'API sont en cours simultanément ;
+        avec un pool de processus, `cpu_workers` photos supplémentaires sont préparées en parallèle.
         """
-        original_width, original_height = image.size
+        window = self.workers + (self.cpu_workers if self.cpu_pool is not None else 0)
+        if window <= 1:
+            for photo_file, photo_path, exif_data in entries:
+                yield photo_file, photo_path, lambda path=photo_path, exif=exif_data: self.analyze_photo(path, exif)
+            return
 
-        # Calcul du ratio de redimensionnement
-        width_ratio = max_width / original_width
-        height_ratio = max_height / original_height
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='plate-recognizer')
+        pending = deque()
+        remaining = iter(entries)
+        try:
+            while True:
+                # Remplir la fenêtre de photos en cours
+                while len(pending) < window:
+                    entry = next(remaining, None)
+                    if entry is None:
+                        break
+                    photo_file, photo_path, exif_data = entry
+                    pending.append((photo_file, photo_path, executor.submit(self.analyze_photo, photo_path, exif_data)))
+
+                if not pending:
+                    break
+
+                photo_file, photo_path, future = pending.popleft()
+                yield photo_file, photo_path, future.result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
-        # Prendre le plus petit ratio pour que l'image tienne dans les limites
-        resize_ratio = min(width_ratio, height_ratio)
+    def extract_exif(self, photo_path):
+        """Extrait la date de prise de vue et les coordonnées GPS d'une photo, sans en décoder les pixels"""
+        exif_data = read_metadata(photo_path)
 
-        # Si l'image est déjà plus petite, ne pas l'agrandir
-        if resize_ratio >= 1:
-            return image
+        # Utiliser la date de modification du fichier si pas de date EXIF
+        if exif_data['datetime'] is None:
+            exif_data['datetime'] = self.file_datetime(photo_path)
 
-        # Nouvelles dimensions
-        new_width = int(original_width * resize_ratio)
-        new_height = int(original_height * resize_ratio)
+        return exif_data
 
-        # Redimensionner avec un filtre de qualité
-        return image.resize((new_width, new_height), Image.LANCZOS)
+    def file_datetime(self, photo_path):
+        """Date de modification du fichier, dans la timezone configurée dans Django"""
+        return timezone.make_aware(datetime.fromtimestamp(os.stat(photo_path).st_mtime))
 
     def format_plate(self, plate):
         if not plate:
@@ -256,101 +816,135 @@ class Command(BaseCommand):
 
         return None
 
-    def recognize_plate(self, photo_path, api_key):
-        """Reconnaît la plaque d'immatriculation via PlateRecognizer"""
-
-        with Image.open(photo_path) as img:
-            # Convertir en RGB si nécessaire (pour les images avec transparence)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            # Redimensionner l'image
-            resized_img = self.resize_image_keep_ratio(img)
-
-            # Convertir en base64
-            img_base64 = self.image_to_base64(resized_img)
-
-            response = requests.post(
-                settings.PLATE_RECOGNIZER_URL,
-                data={'upload': img_base64},
-                headers={'Authorization': f'Token {api_key}'}
-            )
-
-        if response.status_code == 200 or response.status_code == 201:
-            results = response.json()
+    def recognize_plate(self, image_bytes, client):
+        """
+        Reconnaît la plaque d'immatriculation via PlateRecognizer.
+        Les zones de toutes les plaques détectées sont conservées dans le résultat pour le floutage.
+        Une erreur de l'API (PlateRecognizerError) est propagée : la photo n'est pas considérée sans plaque.
+        """
+        with self.metrics.timer('api'):
+            results = client.recognize_image(image_bytes)
 
-            if results['results']:
-                results['results'][0]['resized_img'] = resized_img
-                return results['results'][0]
-        else:
-            self.stdout.write(self.style.ERROR(f'Erreur de l\'API PlateRecognizer: {response.status_code}'))
+        if results:
+            results[0]['boxes'] = [result['box'] for result in results if result.get('box')]
+            return results[0]
 
         return None
 
-    def organize_photo(self, photo_path, output_dir, image, box, vehicle_id, photo_id, date_time):
-        """Organise la photo dans le dossier de sortie"""
+    def organize_photo(self, archive, vehicle_id, photo_id, date_time):
+        """
+        Organise la photo dans le dossier de sortie, toutes les plaques détectées étant déjà floutées.
+        Renvoie le chemin du fichier écrit.
+        """
         # Créer le dossier pour le véhicule
-        vehicle_dir = os.path.join(output_dir, str(vehicle_id))
+        vehicle_dir = os.path.join(self.output_dir, str(vehicle_id))
         os.makedirs(vehicle_dir, exist_ok=True)
 
-        # Créer le nouveau nom de fichier
-        new_filename = f"{vehicle_id}_{photo_id}_{date_time.strftime('%Y%m%d_%H%M%S')}.jpg"
+        # Créer le nouveau nom de fichier (l'extension dépend du format de sortie)
+        extension = OUTPUT_FORMATS[self.output_format][0]
+        new_filename = f"{vehicle_id}_{photo_id}_{date_time.strftime('%Y%m%d_%H%M%S')}{extension}"
         new_path = os.path.join(vehicle_dir, new_filename)
 
-        # Extraire la zone à flouter
-        zone_to_blur = image.crop((box['xmin'], box['ymin'], box['xmax'], box['ymax']))
-
-        # Appliquer le flou
-        blured_zone = zone_to_blur.filter(ImageFilter.GaussianBlur(radius=6))
-
-        # Coller la zone floutée sur l'image originale
-        image.paste(blured_zone, (box['xmin'], box['ymin']))
-
-        # Sauvegarder l'image
-        image.save(new_path)
-
-        # Supprime l'image d'origine
-        os.remove(photo_path)
+        with open(new_path, 'wb') as f:
+            f.write(archive)
+        return new_path
 
-    def update_parking_records(self, current_batch, current_vehicles):
-        """Met à jour les enregistrements de stationnement"""
-        # Récupérer le batch précédent
-        previous_batch = Batch.objects.exclude(id=current_batch.id).first()
+    def update_parking_records(self, current_batch):
+        """
+        Met à jour les enregistrements de stationnement.
+        Le nombre de requêtes ne dépend pas du nombre de véhicules du lot.
+        """
+        with transaction.atomic():
+            # Première et dernière photo de chaque véhicule du lot courant
+            seen = {
+                vehicle_id: (first, last)
+                for vehicle_id, first, last in Photo.objects.filter(batch=current_batch).order_by().values('vehicle')
+                .annotate(first=Min('date_time'), last=Max('date_time')).values_list('vehicle', 'first', 'last')
+            }
+
+            # Récupérer le batch précédent
+            previous_batch = Batch.objects.exclude(id=current_batch.id).filter(completed=True).first()
+
+            if previous_batch:
+                # Dernière photo de chaque véhicule du batch précédent
+                last_seen = dict(
+                    Photo.objects.filter(batch=previous_batch).order_by().values('vehicle')
+                    .annotate(last=Max('date_time')).values_list('vehicle', 'last')
+                )
 
-        if previous_batch:
-            # Véhicules du batch précédent
-            previous_vehicles = set(
-                Photo.objects.filter(batch=previous_batch).values_list('vehicle__finger_print', flat=True)
-            )
+                # Départs : stationnements en cours des véhicules vus au lot précédent mais plus au lot courant
+                open_parks = list(
+                    Park.objects.filter(departure__isnull=True)
+                    .filter(Exists(Photo.objects.filter(batch=previous_batch, vehicle=OuterRef('vehicle'))))
+                    .exclude(Exists(Photo.objects.filter(batch=current_batch, vehicle=OuterRef('vehicle'))))
+                )
+                for park in open_parks:
+                    # Utiliser la dernière photo du batch précédent comme heure de départ
+                    park.departure = last_seen[park.vehicle_id]
+                Park.objects.bulk_update(open_parks, ['departure'])
+            else:
+                # Premier batch - tous les véhicules arrivent
+                last_seen = {}
+                open_parks = []
 
             # Nouveaux arrivants
-            new_arrivals = current_vehicles - previous_vehicles
-            for finger_print in new_arrivals:
-                vehicle = Vehicle.objects.get(finger_print=finger_print)
-                first_photo = Photo.objects.filter(vehicle=vehicle, batch=current_batch).order_by('date_time').first()
-                Park.objects.create(
-                    vehicle=vehicle,
-                    arrival=first_photo.date_time
-                )
+            new_parks = Park.objects.bulk_create([
+                Park(vehicle_id=vehicle_id, arrival=first)
+                for vehicle_id, (first, last) in sorted(seen.items())
+                if vehicle_id not in last_seen
+            ])
 
-            # Départs
-            departures = previous_vehicles - current_vehicles
-            for finger_print in departures:
-                vehicle = Vehicle.objects.get(finger_print=finger_print)
-                # Trouver le stationnement en cours
-                park = Park.objects.filter(vehicle=vehicle, departure__isnull=True).first()
-                if park:
-                    # Utiliser la dernière photo du batch précédent comme heure de départ
-                    last_photo = Photo.objects.filter(vehicle=vehicle, batch=previous_batch).order_by(
-                        '-date_time').first()
-                    park.departure = last_photo.date_time
-                    park.save()
-        else:
-            # Premier batch - tous les véhicules arrivent
-            for finger_print in current_vehicles:
-                vehicle = Vehicle.objects.get(finger_print=finger_print)
-                first_photo = Photo.objects.filter(vehicle=vehicle, batch=current_batch).order_by('date_time').first()
-                Park.objects.create(
-                    vehicle=vehicle,
-                    arrival=first_photo.date_time
-                )
+            self.update_vehicle_stats(seen, open_parks, new_parks)
+
+    def update_vehicle_stats(self, seen, closed_parks, new_parks):
+        """
+        Répercute sur les statistiques des véhicules les stationnements terminés et commencés par un lot,
+        sans recalculer leur historique
+        """
+        closed = closed_park_totals((park.vehicle_id, park.arrival, park.departure) for park in closed_parks)
+        opened = Counter(park.vehicle_id for park in new_parks)
+        arrivals = {}
+        for park in new_parks:
+            arrivals[park.vehicle_id] = max(park.arrival, arrivals.get(park.vehicle_id, park.arrival))
+
+        vehicle_ids = set(seen) | set(closed)
+        stats = VehicleStats.objects.in_bulk(vehicle_ids)
+        now = timezone.now()
+        created, changed = [], []
+
+        for vehicle_id in sorted(vehicle_ids):
+            if vehicle_id in stats:
+                vehicle_stats = stats[vehicle_id]
+                changed.append(vehicle_stats)
+            else:
+                vehicle_stats = VehicleStats(vehicle_id=vehicle_id)
+                created.append(vehicle_stats)
+
+            if vehicle_id in closed:
+                count, minutes, longest = closed[vehicle_id]
+                vehicle_stats.open_parks = max(vehicle_stats.open_parks - count, 0)
+                vehicle_stats.business_minutes += minutes
+                if vehicle_stats.longest_stay is None or longest > vehicle_stats.longest_stay:
+                    vehicle_stats.longest_stay = longest
+
+            vehicle_stats.total_parks += opened[vehicle_id]
+            vehicle_stats.open_parks += opened[vehicle_id]
+
+            if vehicle_id in seen:
+                last = seen[vehicle_id][1]
+                if vehicle_stats.last_seen is None or last > vehicle_stats.last_seen:
+                    vehicle_stats.last_seen = last
+
+            if vehicle_id in arrivals:
+                arrival = arrivals[vehicle_id]
+                if vehicle_stats.last_arrival is None or arrival > vehicle_stats.last_arrival:
+                    vehicle_stats.last_arrival = arrival
+
+            vehicle_stats.updated = now
+
+        VehicleStats.objects.bulk_create(created)
+        VehicleStats.objects.bulk_update(
+            changed, ['total_parks', 'open_parks', 'business_minutes', 'longest_stay', 'last_seen', 'last_arrival',
+                      'updated'],
+            batch_size=500
+        )
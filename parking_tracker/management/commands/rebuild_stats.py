@@ -0,0 +1,63 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from ...models import Vehicle, VehicleStats, Photo, Park
+from ...utils.stats import closed_park_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-vehicle parking statistics from the full parks and photos history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Number of finished parks read per chunk (default: 5000)')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+
+        with transaction.atomic():
+            parks = {
+                vehicle_id: (total, current, last_arrival)
+                for vehicle_id, total, current, last_arrival in Park.objects.order_by().values('vehicle').annotate(
+                    total=Count('id'), current=Count('id', filter=Q(departure__isnull=True)), last_arrival=Max('arrival')
+                ).values_list('vehicle', 'total', 'current', 'last_arrival')
+            }
+            last_seen = dict(
+                Photo.objects.order_by().values('vehicle').annotate(last=Max('date_time'))
+                .values_list('vehicle', 'last')
+            )
+
+            # Durées ouvrées des stationnements terminés, calculées par paquets
+            closed = {}
+            rows = Park.objects.filter(departure__isnull=False).order_by().values_list(
+                'vehicle_id', 'arrival', 'departure').iterator(chunk_size=chunk_size)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                closed_park_totals(chunk, closed)
+
+            now = timezone.now()
+            stats = []
+            for vehicle_id in Vehicle.objects.order_by('id').values_list('id', flat=True).iterator():
+                total, current, last_arrival = parks.get(vehicle_id, (0, 0, None))
+                count, minutes, longest = closed.get(vehicle_id, (0, 0, None))
+                stats.append(VehicleStats(
+                    vehicle_id=vehicle_id,
+                    total_parks=total,
+                    open_parks=current,
+                    business_minutes=minutes,
+                    longest_stay=longest,
+                    last_seen=last_seen.get(vehicle_id),
+                    last_arrival=last_arrival,
+                    updated=now,
+                ))
+
+            VehicleStats.objects.all().delete()
+            VehicleStats.objects.bulk_create(stats, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Statistiques reconstruites pour {len(stats)} véhicules.'))
@@ -1,26 +1,143 @@
+import csv
 import getpass
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 from django.core.management.base import BaseCommand
 from ...models import Vehicle
-from ...utils.rgpd import RGPD
+from ...utils.rgpd import RGPD, decrypt_rows, init_decryption_worker
 
 class Command(BaseCommand):
     help = 'Reveal the plate of a given vehicle with the secret key and associated password'
 
     def add_arguments(self, parser):
         parser.add_argument('--private_key', type=str, required=True, help='Path to private key file')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of decryption processes (default: number of CPUs)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of vehicles read and decrypted per chunk (default: 500)')
+        parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text',
+                            help='Output format (default: text)')
+        parser.add_argument('--output', type=str, default=None, help='Output file (default: standard output)')
 
     def handle(self, *args, **options):
         private_key = options['private_key']
+        workers = max(1, options['workers'])
+        chunk_size = max(1, options['chunk_size'])
         password = getpass.getpass(prompt='Mot de passe pour votre clé privée :').strip()
 
         try:
             private_key_pem = RGPD.load_private_key_from_file(private_key, password)
-            for vehicle in Vehicle.objects.all():
-                decoded_plate = RGPD.decrypt_text(vehicle.encoded_plate, private_key_pem, password)
 
-                self.stdout.write(
-                    self.style.SUCCESS(f'Le véhicule {vehicle.id} a pour plaque d\'immatriculation: {decoded_plate}.'))
+            output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else None
+            try:
+                writer = self.get_writer(options['format'], output)
+                for vehicle_id, decoded_plate in self.decrypt_all(private_key_pem, password, workers, chunk_size):
+                    writer.write(vehicle_id, decoded_plate)
+                writer.close()
+            finally:
+                if output:
+                    output.close()
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Erreur: {e}.'))
 
+    def iter_chunks(self, chunk_size):
+        """Lit les plaques chiffrées par paquets, sans charger toute la table en mémoire"""
+        rows = Vehicle.objects.order_by('id').values_list('id', 'encoded_plate').iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def decrypt_all(self, private_key_pem, password, workers, chunk_size):
+        """
+        Génère les couples (identifiant, plaque) dans l'ordre des véhicules.
+        Les paquets sont déchiffrés en parallèle, avec au plus deux paquets en attente par processus.
+        """
+        if workers == 1:
+            init_decryption_worker(private_key_pem, password)
+            for chunk in self.iter_chunks(chunk_size):
+                yield from decrypt_rows(chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_decryption_worker,
+                                 initargs=(private_key_pem, password)) as executor:
+            pending = deque()
+            for chunk in self.iter_chunks(chunk_size):
+                pending.append(executor.submit(decrypt_rows, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+
+    def get_writer(self, output_format, output):
+        """Renvoie l'écrivain correspondant au format demandé"""
+        stream = output or CommandOutput(self.stdout)
+        if output_format == 'csv':
+            return CsvWriter(stream)
+        if output_format == 'json':
+            return JsonWriter(stream)
+        return TextWriter(self, output)
+
+
+class CommandOutput:
+    """Sortie de la commande vue comme un fichier : écrit tel quel, sans le retour à la ligne d'OutputWrapper"""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, data):
+        self.stdout.write(data, ending='')
+
+
+class TextWriter:
+    """Sortie lisible, une phrase par véhicule"""
+
+    def __init__(self, command, output):
+        self.command = command
+        self.output = output
+
+    def write(self, vehicle_id, decoded_plate):
+        message = f'Le véhicule {vehicle_id} a pour plaque d\'immatriculation: {decoded_plate}.'
+        if self.output:
+            self.output.write(message + '\n')
+        else:
+            self.command.stdout.write(self.command.style.SUCCESS(message))
+
+    def close(self):
+        pass
+
+
+class CsvWriter:
+    """Sortie CSV (vehicle,plate), écrite au fil de l'eau"""
+
+    def __init__(self, output):
+        self.writer = csv.writer(output)
+        self.writer.writerow(['vehicle', 'plate'])
+
+    def write(self, vehicle_id, decoded_plate):
+        self.writer.writerow([vehicle_id, decoded_plate])
+
+    def close(self):
+        pass
+
+
+class JsonWriter:
+    """Sortie JSON (tableau d'objets), écrite au fil de l'eau"""
+
+    def __init__(self, output):
+        self.output = output
+        self.first = True
+        self.output.write('[')
+
+    def write(self, vehicle_id, decoded_plate):
+        self.output.write(('\n' if self.first else ',\n') + json.dumps({'vehicle': vehicle_id, 'plate': decoded_plate}))
+        self.first = False
 
+    def close(self):
+        self.output.write('\n]\n')
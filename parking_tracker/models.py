@@ -1,6 +1,10 @@
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 
+from .utils.business_hours import business_duration, format_duration
+
 
 class Vehicle(models.Model):
     finger_print = models.TextField(unique=True, blank=True, null=True)
@@ -10,14 +14,61 @@ class Vehicle(models.Model):
     def __str__(self):
         return str(self.id)
 
+class VehicleStats(models.Model):
+    """
+    Statistiques de stationnement d'un véhicule, tenues à jour à chaque lot par process_photos
+    (reconstruites par la commande rebuild_stats)
+    """
+    vehicle = models.OneToOneField(Vehicle, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_parks = models.PositiveIntegerField(default=0)
+    open_parks = models.PositiveIntegerField(default=0)
+    # Cumul des stationnements terminés
+    business_minutes = models.PositiveBigIntegerField(default=0)
+    longest_stay = models.DurationField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True)
+    # Arrivée du stationnement le plus récent (tri « Arrivée la plus récente » du tableau de bord)
+    last_arrival = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistiques du véhicule {self.vehicle_id}"
+
+    @property
+    def business_hours_duration(self):
+        """Temps ouvré cumulé des stationnements terminés, en heures et minutes"""
+        return format_duration(timedelta(minutes=self.business_minutes))
+
+    @property
+    def longest_stay_days(self):
+        """Durée du plus long stationnement terminé, en jours (comme Park.duration_days)"""
+        if self.longest_stay is None:
+            return None
+        return self.longest_stay.days + 1
+
+    class Meta:
+        verbose_name = 'statistiques de véhicule'
+        verbose_name_plural = 'statistiques de véhicules'
+        indexes = [
+            models.Index(fields=['total_parks'], name='stats_total_parks_idx'),
+            models.Index(fields=['last_seen'], name='stats_last_seen_idx'),
+            models.Index(fields=['last_arrival'], name='stats_last_arrival_idx'),
+        ]
+
+
 class Batch(models.Model):
     created = models.DateTimeField(auto_now_add=True)
+    # Un traitement crée son lot avec completed=False et le passe à True une fois les stationnements
+    # mis à jour ; les lots antérieurs au journal de traitement sont considérés comme terminés
+    completed = models.BooleanField(default=True)
 
     def __str__(self):
         return f"Batch {self.id} - {self.created.strftime('%Y-%m-%d %H:%M:%S')}"
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['created'], name='batch_created_idx'),
+        ]
 
 
 class Photo(models.Model):
@@ -29,10 +80,45 @@ class Photo(models.Model):
     created = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.vehicle.id} - {self.date_time.strftime('%Y-%m-%d %H:%M:%S')}"
+        return f"{self.vehicle_id} - {self.date_time.strftime('%Y-%m-%d %H:%M:%S')}"
 
     class Meta:
         ordering = ['-date_time']
+        indexes = [
+            # Photos d'un véhicule dans un lot, triées par date (mise à jour des stationnements)
+            models.Index(fields=['batch', 'vehicle', 'date_time'], name='photo_batch_vehicle_dt_idx'),
+        ]
+
+
+class Checkpoint(models.Model):
+    """Journal de traitement d'une photo au sein d'un lot, pour reprendre un traitement interrompu"""
+    PENDING = 'pending'
+    RECOGNIZED = 'recognized'
+    STORED = 'stored'
+    MOVED = 'moved'
+    FAILED = 'failed'
+    STATES = [
+        (PENDING, 'En attente'),
+        (RECOGNIZED, 'Reconnue'),
+        (STORED, 'Enregistrée'),
+        (MOVED, 'Classée'),
+        (FAILED, 'En quarantaine'),
+    ]
+
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    # Taille et date de modification du fichier traité : un fichier remplacé sous le même nom repart de zéro
+    signature = models.CharField(max_length=64, blank=True)
+    state = models.CharField(max_length=16, choices=STATES, default=PENDING)
+    photo = models.ForeignKey(Photo, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.batch_id} - {self.file_name} ({self.state})"
+
+    class Meta:
+        unique_together = [('batch', 'file_name')]
 
 
 class Park(models.Model):
@@ -41,7 +127,7 @@ class Park(models.Model):
     departure = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"{self.vehicle.id} - {self.arrival.strftime('%Y-%m-%d %H:%M:%S')}"
+        return f"{self.vehicle_id} - {self.arrival.strftime('%Y-%m-%d %H:%M:%S')}"
 
     @property
     def duration_days(self):
@@ -50,34 +136,9 @@ class Park(models.Model):
 
     @property
     def business_hours_duration(self):
-        """Calcule la durée en heures et minutes entre 8h30 et 18h30, lundi à samedi"""
-        from datetime import time, timedelta
-
-        start = self.arrival
+        """Calcule la durée en heures et minutes entre 9h00 et 18h00, lundi à samedi"""
         end = self.departure or timezone.now()
-
-        total_minutes = 0
-        current = start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        while current.date() <= end.date():
-            # Vérifier si c'est un jour ouvrable (lundi=0, dimanche=6)
-            if current.weekday() < 6:  # Lundi à samedi
-                day_start = current.replace(hour=9, minute=0)
-                day_end = current.replace(hour=18, minute=00)
-
-                # Calculer l'intersection avec la période de stationnement
-                period_start = max(start, day_start)
-                period_end = min(end, day_end)
-
-                if period_start < period_end:
-                    duration = period_end - period_start
-                    total_minutes += duration.total_seconds() / 60
-
-            current += timedelta(days=1)
-
-        hours = int(total_minutes // 60)
-        minutes = int(total_minutes % 60)
-        return f"{hours}h {minutes:02d}m"
+        return format_duration(business_duration(self.arrival, end))
 
     @property
     def status_class(self):
@@ -94,3 +155,8 @@ class Park(models.Model):
 
     class Meta:
         ordering = ['-arrival']
+        indexes = [
+            models.Index(fields=['vehicle', 'departure'], name='park_vehicle_departure_idx'),
+            # Stationnements en cours uniquement
+            models.Index(fields=['vehicle'], condition=models.Q(departure__isnull=True), name='park_open_idx'),
+        ]
@@ -0,0 +1,492 @@
+import io
+import os
+import random
+import tempfile
+from itertools import groupby
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from cryptography.hazmat.primitives import serialization
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .management.commands.process_photos import Command as ProcessPhotosCommand
+from .models import Batch, Checkpoint, Park, Photo, Vehicle, VehicleStats
+from .utils.business_hours import business_duration, business_durations, park_business_durations
+from .utils.metrics import Metrics
+from .utils.occupancy import Occupancy, park_intervals
+from .utils.rgpd import RGPD
+from .views import encode_cursor
+
+PARIS = ZoneInfo('Europe/Paris')
+UTC = dt_timezone.utc
+
+
+def make_fleet(size, start=datetime(2025, 3, 3, 8, 0, tzinfo=UTC)):
+    """Crée `size` véhicules avec leurs statistiques, un stationnement terminé et un en cours chacun"""
+    vehicles = Vehicle.objects.bulk_create([
+        Vehicle(finger_print=f'empreinte-{size}-{i}', encoded_plate=f'plaque-{i}') for i in range(size)
+    ])
+    Park.objects.bulk_create([
+        park
+        for i, vehicle in enumerate(vehicles)
+        for park in (
+            Park(vehicle=vehicle, arrival=start + timedelta(hours=i), departure=start + timedelta(days=2, hours=i)),
+            Park(vehicle=vehicle, arrival=start + timedelta(days=5, hours=i)),
+        )
+    ])
+    VehicleStats.objects.bulk_create([
+        VehicleStats(vehicle=vehicle, total_parks=2, open_parks=1, last_seen=start + timedelta(days=5, hours=i))
+        for i, vehicle in enumerate(vehicles)
+    ])
+    return vehicles
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plans de requête lus avec EXPLAIN QUERY PLAN (SQLite)')
+class QueryPlanTests(TestCase):
+    """Les requêtes fréquentes s'appuient sur les index composites et partiels des modèles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicles = make_fleet(20)
+        start = datetime(2025, 3, 10, 8, 0, tzinfo=UTC)
+        cls.previous = Batch.objects.create()
+        cls.current = Batch.objects.create(completed=False)
+        Photo.objects.bulk_create([
+            Photo(vehicle=vehicle, batch=batch, date_time=start + timedelta(days=day, minutes=i))
+            for day, batch, vehicles in ((0, cls.previous, cls.vehicles), (1, cls.current, cls.vehicles[:10]))
+            for i, vehicle in enumerate(vehicles)
+        ])
+
+    def query_plans(self, run):
+        """Exécute `run` et renvoie le plan de chacune des requêtes SELECT qu'il a lancées"""
+        with CaptureQueriesContext(connection) as queries:
+            run()
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if query['sql'].startswith('SELECT'):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+        return plans
+
+    def assertIndexUsed(self, plans, index):
+        self.assertTrue(any(index in plan for plan in plans), f'{index} absent des plans : {plans}')
+
+    def test_dashboard_prefetches_parks_by_vehicle_index(self):
+        plans = self.query_plans(lambda: self.client.get(reverse('parking_tracker:dashboard'), {'per_page': 100}))
+        self.assertIndexUsed(plans, 'park_vehicle_departure_idx')
+
+    def test_open_parks_use_partial_index(self):
+        plan = Park.objects.filter(vehicle=self.vehicles[0], departure__isnull=True).explain()
+        self.assertRegex(plan, 'park_open_idx|park_vehicle_departure_idx')
+
+        plans = self.query_plans(lambda: ProcessPhotosCommand().update_parking_records(self.current))
+        self.assertIndexUsed(plans, 'park_open_idx')
+
+    def test_batch_photos_use_composite_index(self):
+        plan = Photo.objects.filter(batch=self.current, vehicle=self.vehicles[0]).order_by('date_time').explain()
+        self.assertIn('photo_batch_vehicle_dt_idx', plan)
+
+        plans = self.query_plans(lambda: ProcessPhotosCommand().update_parking_records(self.current))
+        self.assertIndexUsed(plans, 'photo_batch_vehicle_dt_idx')
+
+    def test_latest_batch_uses_created_index(self):
+        self.assertIn('batch_created_idx', Batch.objects.all()[:1].explain())
+
+
+class DashboardQueryCountTests(TestCase):
+    """Le tableau de bord lance le même nombre de requêtes quelle que soit la taille de la flotte"""
+
+    # Véhicules (avec statistiques), stationnements préchargés, totaux, nombre de véhicules
+    QUERIES = 4
+
+    def assertDashboardQueries(self, fleet_size):
+        make_fleet(fleet_size)
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.get(reverse('parking_tracker:dashboard'), {'per_page': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['vehicle_data']), fleet_size)
+
+    def test_small_fleet(self):
+        self.assertDashboardQueries(2)
+
+    def test_large_fleet(self):
+        self.assertDashboardQueries(60)
+
+    def test_filtered_page(self):
+        make_fleet(30)
+        with self.assertNumQueries(self.QUERIES):
+            self.client.get(reverse('parking_tracker:dashboard'), {'present': '1', 'min_days': '3', 'sort': 'recent'})
+
+
+class DashboardSortTests(TestCase):
+    """Tri et pagination du tableau de bord"""
+
+    def test_recent_sort_uses_last_arrival(self):
+        start = datetime(2025, 3, 3, 8, 0, tzinfo=UTC)
+        # Véhicule garé depuis longtemps mais photographié à chaque passage, et véhicule arrivé récemment
+        long_stay, newcomer = make_fleet(2)
+        VehicleStats.objects.filter(vehicle=long_stay).update(last_arrival=start, last_seen=start + timedelta(days=30))
+        VehicleStats.objects.filter(vehicle=newcomer).update(last_arrival=start + timedelta(days=20),
+                                                             last_seen=start + timedelta(days=20))
+
+        response = self.client.get(reverse('parking_tracker:dashboard'), {'sort': 'recent'})
+        self.assertEqual([data['vehicle'] for data in response.context['vehicle_data']], [newcomer, long_stay])
+
+    def test_invalid_cursor_shows_first_page(self):
+        make_fleet(3)
+        # Clé de tri du mauvais type, ou curseur illisible
+        cases = [(sort, after) for sort in ('parks', 'recent')
+                 for after in (encode_cursor('abc', 1), encode_cursor(None, 1))]
+        cases += [(sort, after) for sort in ('parks', 'recent', 'vehicle')
+                  for after in ('pas-un-curseur', encode_cursor(1, 'x'))]
+        for sort, after in cases:
+            with self.subTest(sort=sort, after=after):
+                response = self.client.get(reverse('parking_tracker:dashboard'), {'sort': sort, 'after': after})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['vehicle_data']), 3)
+
+
+class ExportAccessTests(TestCase):
+    """L'export des données est réservé aux membres de l'équipe"""
+
+    def test_anonymous_redirected_to_login(self):
+        response = self.client.get(reverse('parking_tracker:export', args=['parks']))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('admin:login'), response['Location'])
+
+    def test_non_staff_redirected_to_login(self):
+        self.client.force_login(User.objects.create_user('visiteur'))
+        response = self.client.get(reverse('parking_tracker:export', args=['parks']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_staff_downloads_csv(self):
+        make_fleet(3)
+        self.client.force_login(User.objects.create_user('equipe', is_staff=True))
+        response = self.client.get(reverse('parking_tracker:export', args=['parks']))
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'id,vehicle,arrival,departure,ongoing,duration_seconds,business_seconds')
+        self.assertEqual(len(lines), 1 + 6)
+
+
+class RGPDKeyFileTests(unittest.TestCase):
+    """Le contexte de chiffrement se construit depuis un fichier en une seule analyse de la clé"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.public_key_pem, self.private_key_pem = RGPD.generate_key_pair()
+        self.public_path = os.path.join(directory.name, 'public.pem')
+        self.private_path = os.path.join(directory.name, 'private.pem')
+        RGPD.save_key_to_file(self.public_key_pem, self.public_path)
+        RGPD.save_key_to_file(self.private_key_pem, self.private_path)
+
+    def test_single_parse(self):
+        with mock.patch('parking_tracker.utils.rgpd.serialization.load_pem_public_key',
+                        wraps=serialization.load_pem_public_key) as load:
+            rgpd = RGPD.from_public_key_file(self.public_path)
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(rgpd.fingerprint('AB-123-CD'),
+                         RGPD.from_public_key(self.public_key_pem).fingerprint('AB-123-CD'))
+
+    def test_rejects_invalid_files(self):
+        with self.assertRaises(ValueError):
+            RGPD.from_public_key_file(self.private_path)
+        with self.assertRaises(FileNotFoundError):
+            RGPD.from_public_key_file(self.public_path + '.absent')
+
+
+class StorePhotosTests(TestCase):
+    """Les véhicules et photos insérés par paquets reçoivent leur identifiant, même sans INSERT ... RETURNING"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Contexte de chiffrement non copiable : hors de setUpTestData
+        public_key_pem, private_key_pem = RGPD.generate_key_pair()
+        cls.rgpd = RGPD.from_public_key(public_key_pem)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.known = Vehicle.objects.create(finger_print='connue', encoded_plate='plaque')
+
+    def store(self):
+        command = ProcessPhotosCommand(stdout=io.StringIO())
+        command.rgpd = self.rgpd
+        command.metrics = Metrics('tests')
+        batch = Batch.objects.create(completed=False)
+        moment = datetime(2025, 3, 3, 9, 0, tzinfo=UTC)
+        items = [
+            {
+                'checkpoint': Checkpoint.objects.create(batch=batch, file_name=f'photo-{i}.jpg'),
+                'exif_data': {'datetime': moment + timedelta(minutes=i)},
+                'plate_number': f'AB-{i % 3}',
+                'finger_print': 'connue' if i % 3 == 0 else f'nouvelle-{i % 3}',
+                'stored': False,
+            }
+            for i in range(7)
+        ]
+        command.store_photos(batch, items)
+        return items
+
+    def assertStored(self, items):
+        for item in items:
+            checkpoint = Checkpoint.objects.get(pk=item['checkpoint'].pk)
+            photo = item['checkpoint'].photo
+            self.assertEqual(checkpoint.state, Checkpoint.STORED)
+            self.assertEqual(checkpoint.photo_id, photo.id)
+            self.assertEqual(Photo.objects.get(pk=photo.id).date_time, item['exif_data']['datetime'])
+            self.assertEqual(Vehicle.objects.get(pk=photo.vehicle_id).finger_print, item['finger_print'])
+
+    def test_returned_ids(self):
+        self.assertStored(self.store())
+
+    def test_without_returned_ids(self):
+        # SQLite < 3.35 : bulk_create ne renvoie pas les clés primaires
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.assertStored(self.store())
+
+
+class ParkingRecordsQueryCountTests(TestCase):
+    """La mise à jour des stationnements lance le même nombre de requêtes quelle que soit la taille du lot"""
+
+    # Savepoint, photos du lot, lot précédent, dernières photos du lot précédent, stationnements en cours,
+    # départs, arrivées, statistiques lues, créées et mises à jour, libération du savepoint
+    QUERIES = 11
+
+    def make_batches(self, size):
+        """
+        Lot précédent avec `size` véhicules garés, puis lot courant où la moitié est partie
+        et `size` nouveaux véhicules sont arrivés
+        """
+        start = datetime(2025, 3, 10, 8, 0, tzinfo=UTC)
+        vehicles = make_fleet(size)
+        newcomers = Vehicle.objects.bulk_create([
+            Vehicle(finger_print=f'nouveau-{size}-{i}', encoded_plate=f'nouvelle-{i}') for i in range(size)
+        ])
+        previous = Batch.objects.create()
+        current = Batch.objects.create(completed=False)
+        staying = vehicles[:size // 2]
+        Photo.objects.bulk_create(
+            [Photo(vehicle=vehicle, batch=previous, date_time=start + timedelta(minutes=i))
+             for i, vehicle in enumerate(vehicles)] +
+            [Photo(vehicle=vehicle, batch=current, date_time=start + timedelta(days=1, minutes=i))
+             for i, vehicle in enumerate(staying + newcomers)]
+        )
+        return current, vehicles[size // 2:], newcomers
+
+    def assertParkingQueries(self, size):
+        current, departed, newcomers = self.make_batches(size)
+        with self.assertNumQueries(self.QUERIES):
+            ProcessPhotosCommand().update_parking_records(current)
+
+        self.assertFalse(Park.objects.filter(vehicle__in=departed, departure__isnull=True).exists())
+        self.assertEqual(Park.objects.filter(vehicle__in=newcomers, departure__isnull=True).count(), size)
+        self.assertEqual(VehicleStats.objects.filter(vehicle__in=departed, open_parks=0).count(), len(departed))
+        self.assertEqual(VehicleStats.objects.filter(vehicle__in=newcomers, total_parks=1).count(), size)
+
+    def test_small_batch(self):
+        self.assertParkingQueries(2)
+
+    def test_large_batch(self):
+        # Sous les limites de paramètres SQLite, au-delà desquelles Django découpe les requêtes groupées
+        self.assertParkingQueries(50)
+
+
+class IncrementalStatsTests(TestCase):
+    """Les statistiques tenues à jour lot après lot sont celles que reconstruit rebuild_stats"""
+
+    FIELDS = ('vehicle', 'total_parks', 'open_parks', 'business_minutes', 'longest_stay', 'last_seen', 'last_arrival')
+
+    def snapshot(self):
+        return list(VehicleStats.objects.order_by('vehicle').values_list(*self.FIELDS))
+
+    def test_matches_rebuild(self):
+        rng = random.Random(2025)
+        vehicles = Vehicle.objects.bulk_create([
+            Vehicle(finger_print=f'empreinte-{i}', encoded_plate=f'plaque-{i}') for i in range(12)
+        ])
+        start = datetime(2025, 3, 6, 8, 0, tzinfo=UTC)
+        command = ProcessPhotosCommand()
+
+        # Passages quotidiens, week-end compris : les véhicules arrivent, partent et reviennent
+        for day in range(10):
+            batch = Batch.objects.create(completed=False)
+            Batch.objects.filter(pk=batch.pk).update(created=start + timedelta(days=day))
+            Photo.objects.bulk_create([
+                Photo(vehicle=vehicle, batch=batch,
+                      date_time=start + timedelta(days=day, hours=rng.randint(0, 10), minutes=rng.randint(0, 59)))
+                for vehicle in vehicles if rng.random() < 0.6
+                for _ in range(rng.randint(1, 3))
+            ])
+            command.update_parking_records(batch)
+            Batch.objects.filter(pk=batch.pk).update(completed=True)
+
+        incremental = self.snapshot()
+        self.assertTrue(Park.objects.filter(departure__isnull=False).exists())
+        call_command('rebuild_stats', stdout=io.StringIO())
+        self.assertEqual(incremental, self.snapshot())
+
+
+def loop_business_duration(start, end):
+    """
+    Ancien calcul jour par jour (Park.business_hours_duration avant le calcul en temps constant), en heure de Paris :
+    sert d'oracle aux tests
+    """
+    start = start.astimezone(PARIS)
+    end = end.astimezone(PARIS)
+
+    total = timedelta()
+    current = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    while current.date() <= end.date():
+        if current.weekday() < 6:
+            period_start = max(start, current.replace(hour=9, minute=0))
+            period_end = min(end, current.replace(hour=18, minute=0))
+            if period_start < period_end:
+                total += period_end - period_start
+        current += timedelta(days=1)
+
+    return total
+
+
+@override_settings(TIME_ZONE='Europe/Paris')
+class BusinessDurationTests(TestCase):
+    """Le calcul en temps constant et sa variante vectorisée reproduisent l'ancien calcul jour par jour"""
+
+    # Changements d'heure en Europe/Paris (UTC) : passage à l'heure d'été puis à l'heure d'hiver
+    DST_CHANGES = [
+        datetime(2024, 3, 31, 1, 0, tzinfo=UTC), datetime(2024, 10, 27, 1, 0, tzinfo=UTC),
+        datetime(2025, 3, 30, 1, 0, tzinfo=UTC), datetime(2025, 10, 26, 1, 0, tzinfo=UTC),
+    ]
+
+    def random_periods(self, rng, count):
+        """Périodes aléatoires : quelconques, autour d'un changement d'heure, ou bornées à la minute ronde"""
+        periods = []
+        for i in range(count):
+            if i % 3 == 0:
+                start = rng.choice(self.DST_CHANGES) + timedelta(minutes=rng.randint(-3 * 24 * 60, 24 * 60))
+            else:
+                start = datetime(2024, 1, 1, tzinfo=UTC) + timedelta(seconds=rng.randint(0, 730 * 86400))
+            if i % 5 == 0:
+                start = start.replace(second=0, microsecond=0)
+            end = start + timedelta(seconds=rng.choice((rng.randint(0, 86400), rng.randint(0, 200 * 86400))))
+            periods.append((start, end))
+        return periods
+
+    def test_matches_day_by_day_loop(self):
+        rng = random.Random(20250330)
+        for start, end in self.random_periods(rng, 500):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(business_duration(start, end), loop_business_duration(start, end))
+
+    def test_vectorized_matches_day_by_day_loop(self):
+        rng = random.Random(20251026)
+        periods = self.random_periods(rng, 500)
+        durations = business_durations([start for start, end in periods], [end for start, end in periods])
+
+        for (start, end), us in zip(periods, durations):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(timedelta(microseconds=int(us)), loop_business_duration(start, end))
+
+    def test_dst_days(self):
+        # Journées entières de changement d'heure (dimanche) et samedis qui les précèdent
+        for change in self.DST_CHANGES:
+            for start, end in ((change - timedelta(days=1, hours=2), change + timedelta(hours=20)),
+                               (change - timedelta(days=2), change + timedelta(days=2))):
+                with self.subTest(start=start, end=end):
+                    expected = loop_business_duration(start, end)
+                    self.assertEqual(business_duration(start, end), expected)
+                    self.assertEqual(int(business_durations([start], [end])[0]), expected // timedelta(microseconds=1))
+
+    def test_open_parks(self):
+        rng = random.Random(42)
+        now = datetime(2025, 11, 4, 15, 37, 12, tzinfo=UTC)
+        vehicle = Vehicle.objects.create(finger_print='empreinte', encoded_plate='plaque')
+        parks = Park.objects.bulk_create([
+            Park(vehicle=vehicle, arrival=start, departure=None if i % 2 else end)
+            for i, (start, end) in enumerate(self.random_periods(rng, 60))
+            if end <= now
+        ])
+
+        durations = park_business_durations(Park.objects.all(), now=now)
+        for park in parks:
+            with self.subTest(arrival=park.arrival, departure=park.departure):
+                self.assertEqual(durations[park.id], loop_business_duration(park.arrival, park.departure or now))
+
+
+class OccupancyTests(TestCase):
+    """Le balayage vectorisé des arrivées et départs reproduit un décompte instant par instant"""
+
+    def random_occupancy(self, rng):
+        # Petits entiers, pour multiplier les arrivées et départs simultanés
+        arrivals = [rng.randint(0, 120) for _ in range(rng.randint(0, 30))]
+        departures = [arrival + rng.choice((0, rng.randint(0, 40))) for arrival in arrivals]
+        return arrivals, departures
+
+    @staticmethod
+    def present_at(arrivals, departures, moment):
+        # Un véhicule est présent de son arrivée à son départ inclus
+        return sum(arrival <= moment <= departure for arrival, departure in zip(arrivals, departures))
+
+    def test_buckets_match_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            arrivals, departures = self.random_occupancy(rng)
+            edges = sorted({rng.randint(-5, 170) for _ in range(rng.randint(2, 12))})
+            if len(edges) < 2:
+                continue
+            buckets = Occupancy(arrivals, departures).buckets(np.array(edges))
+
+            for i, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+                with self.subTest(arrivals=arrivals, departures=departures, start=start, end=end):
+                    parks = list(zip(arrivals, departures))
+                    self.assertEqual(buckets['present'][i], sum(a < end and d >= start for a, d in parks))
+                    overlap = sum(max(0, min(d, end) - max(a, start)) for a, d in parks)
+                    self.assertAlmostEqual(buckets['average'][i], overlap / (end - start))
+                    self.assertEqual(buckets['peak'][i], max(
+                        self.present_at(arrivals, departures, moment) for moment in range(start, end)))
+
+    def test_peaks_match_brute_force(self):
+        rng = random.Random(11)
+        for _ in range(200):
+            arrivals, departures = self.random_occupancy(rng)
+            limit = rng.randint(1, 6)
+
+            # Occupation à chaque instant entier puis juste après, regroupée en paliers
+            samples = [(moment, self.present_at(arrivals, departures, moment + half))
+                       for moment in range(-2, 170) for half in (0, 0.5)]
+            levels = [(level, [moment for moment, _ in run]) for level, run in groupby(samples, key=lambda s: s[1])]
+
+            # Paliers plus hauts que leurs voisins : du début du palier au début du suivant
+            expected = [
+                (moments[0], following[0], level)
+                for (previous, _), (level, moments), (next_level, following) in zip(levels, levels[1:], levels[2:])
+                if previous < level > next_level
+            ]
+            expected = sorted(expected, key=lambda peak: (-peak[2], peak[0]))[:limit]
+
+            with self.subTest(arrivals=arrivals, departures=departures, limit=limit):
+                self.assertEqual(Occupancy(arrivals, departures).peaks(limit), expected)
+
+    def test_park_intervals(self):
+        vehicles = make_fleet(4)
+        now = datetime(2025, 3, 20, 12, 0, tzinfo=UTC)
+        arrivals, departures = park_intervals(Park.objects.all(), now=now)
+
+        parks = Park.objects.order_by().values_list('arrival', 'departure')
+        self.assertEqual(len(arrivals), 2 * len(vehicles))
+        self.assertEqual(sorted(zip(arrivals.tolist(), departures.tolist())), sorted(
+            (int(arrival.timestamp()), int((departure or now).timestamp())) for arrival, departure in parks
+        ))
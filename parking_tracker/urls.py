@@ -5,4 +5,6 @@ app_name = 'parking_tracker'
 
 urlpatterns = [
     path('', views.parking_dashboard, name='dashboard'),
+    path('occupancy/', views.occupancy_data, name='occupancy'),
+    path('export/<str:table>/', views.export_table, name='export'),
 ]
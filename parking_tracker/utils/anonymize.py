@@ -0,0 +1,81 @@
+import io
+
+from PIL import ImageFilter, features
+
+# Formats de sortie : extension et options d'encodage
+OUTPUT_FORMATS = {
+    'JPEG': ('.jpg', {'optimize': True}),
+    'WEBP': ('.webp', {'method': 2}),
+    'AVIF': ('.avif', {'speed': 8}),
+}
+
+
+def check_output_format(output_format):
+    """
+    Vérifie qu'un format de sortie est connu et pris en charge par Pillow
+
+    Args:
+        output_format (str): Nom du format (JPEG, WEBP ou AVIF)
+
+    Returns:
+        str: Le nom du format, en majuscules
+
+    Raises:
+        ValueError: Si le format est inconnu ou si Pillow n'a pas été compilé avec son support
+    """
+    output_format = output_format.upper()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Format de sortie inconnu : {output_format}')
+    if output_format != 'JPEG' and not features.check(output_format.lower()):
+        raise ValueError(f'Pillow ne prend pas en charge le format {output_format} sur cette installation')
+    return output_format
+
+
+def blur_boxes(image, boxes, radius=6):
+    """
+    Floute chaque zone détectée d'une image, en place.
+    Seule une marge autour de chaque zone est filtrée, pour éviter les bords nets du flou.
+
+    Args:
+        image (PIL.Image): L'image à anonymiser
+        boxes (list): Zones détectées, au format PlateRecognizer (xmin, ymin, xmax, ymax)
+        radius (int): Rayon du flou gaussien
+    """
+    width, height = image.size
+
+    for box in boxes:
+        xmin, ymin = max(box['xmin'], 0), max(box['ymin'], 0)
+        xmax, ymax = min(box['xmax'], width), min(box['ymax'], height)
+        if xmin >= xmax or ymin >= ymax:
+            continue
+
+        # Zone élargie du rayon du flou : les pixels voisins participent au flou
+        margin = 2 * radius
+        left, top = max(xmin - margin, 0), max(ymin - margin, 0)
+        region = image.crop((left, top, min(xmax + margin, width), min(ymax + margin, height)))
+        blurred = region.filter(ImageFilter.GaussianBlur(radius=radius))
+
+        # Ne recoller que la zone détectée
+        image.paste(blurred.crop((xmin - left, ymin - top, xmax - left, ymax - top)), (xmin, ymin))
+
+
+def encode_archive(image, output_format='JPEG', quality=75, progressive=False):
+    """
+    Encode une image anonymisée dans le format d'archivage choisi
+
+    Args:
+        image (PIL.Image): L'image à encoder
+        output_format (str): JPEG (tables de Huffman optimisées), WEBP ou AVIF
+        quality (int): Qualité de compression (1-100)
+        progressive (bool): JPEG progressif (affichage progressif, encodage environ deux fois plus long)
+
+    Returns:
+        bytes: Le contenu du fichier à archiver (extension : OUTPUT_FORMATS[output_format][0])
+    """
+    extension, options = OUTPUT_FORMATS[output_format]
+    if output_format == 'JPEG' and progressive:
+        options = dict(options, progressive=True)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=output_format, quality=quality, **options)
+    return buffer.getvalue()
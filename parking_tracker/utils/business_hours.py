@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.utils import timezone
+
+# Créneau ouvré : 9h00-18h00, du lundi au samedi (heure locale, settings.TIME_ZONE)
+BUSINESS_START = timedelta(hours=9)
+BUSINESS_END = timedelta(hours=18)
+BUSINESS_DAYS = 6
+
+ONE_US = timedelta(microseconds=1)
+DAY_US = (BUSINESS_END - BUSINESS_START) // ONE_US
+WEEK_US = BUSINESS_DAYS * DAY_US
+START_US = BUSINESS_START // ONE_US
+FULL_DAY_US = timedelta(days=1) // ONE_US
+
+# Un lundi de référence, à partir duquel sont comptées les semaines
+EPOCH = datetime(2000, 1, 3)
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+EPOCH_US = (EPOCH - UNIX_EPOCH.replace(tzinfo=None)) // ONE_US
+
+# Les changements d'heure tombent sur des quarts d'heure UTC, au plus une fois par jour
+OFFSET_BUCKET_US = 15 * 60 * 10 ** 6
+
+
+def business_time_before(moment):
+    """
+    Durée ouvrée (en microsecondes) écoulée entre le lundi de référence et un instant local naïf.
+    Le créneau 9h00-18h00 ne contient jamais de changement d'heure : les heures murales suffisent.
+    """
+    days = (moment.date() - EPOCH.date()).days
+    weeks, weekday = divmod(days, 7)
+
+    elapsed = weeks * WEEK_US + min(weekday, BUSINESS_DAYS) * DAY_US
+    if weekday < BUSINESS_DAYS:
+        since_midnight = moment - moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed += min(max(since_midnight // ONE_US - START_US, 0), DAY_US)
+
+    return elapsed
+
+
+def business_duration(start, end):
+    """
+    Calcule en temps constant la durée passée dans les créneaux ouvrés entre deux instants
+
+    Args:
+        start (datetime): Début de la période
+        end (datetime): Fin de la période
+
+    Returns:
+        timedelta: La durée ouvrée
+    """
+    start = timezone.localtime(start).replace(tzinfo=None) if timezone.is_aware(start) else start
+    end = timezone.localtime(end).replace(tzinfo=None) if timezone.is_aware(end) else end
+
+    return timedelta(microseconds=max(business_time_before(end) - business_time_before(start), 0))
+
+
+def business_durations(starts, ends):
+    """
+    Variante vectorisée de business_duration pour un ensemble de périodes
+
+    Args:
+        starts (list): Débuts des périodes (datetime)
+        ends (list): Fins des périodes (datetime)
+
+    Returns:
+        numpy.ndarray: Les durées ouvrées, en microsecondes (int64)
+    """
+    zone = timezone.get_current_timezone()
+
+    def to_local(values):
+        # Instants UTC en microsecondes, décalés à l'heure locale
+        utc = np.fromiter((
+            ((v if timezone.is_aware(v) else timezone.make_aware(v)) - UNIX_EPOCH) // ONE_US for v in values
+        ), dtype=np.int64, count=len(values))
+        return utc + local_offsets(utc)
+
+    def local_offsets(utc):
+        # Décalage local une fois par jour UTC distinct ; les rares jours de changement d'heure
+        # sont résolus au quart d'heure près
+        days, inverse = np.unique(utc // FULL_DAY_US, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        first = offsets_at(days * FULL_DAY_US)
+        last = offsets_at((days + 1) * FULL_DAY_US - 1)
+
+        offsets = first[inverse]
+        changing = (first != last)[inverse]
+        if changing.any():
+            offsets[changing] = offsets_at(utc[changing] // OFFSET_BUCKET_US * OFFSET_BUCKET_US)
+        return offsets
+
+    def offsets_at(instants):
+        return np.fromiter((
+            (UNIX_EPOCH + timedelta(microseconds=int(us))).astimezone(zone).utcoffset() // ONE_US
+            for us in instants
+        ), dtype=np.int64, count=len(instants))
+
+    def elapsed(moments):
+        days, since_midnight = np.divmod(moments - EPOCH_US, FULL_DAY_US)
+        weeks, weekday = np.divmod(days, 7)
+        today = np.where(weekday < BUSINESS_DAYS, np.clip(since_midnight - START_US, 0, DAY_US), 0)
+        return weeks * WEEK_US + np.minimum(weekday, BUSINESS_DAYS) * DAY_US + today
+
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    return np.maximum(elapsed(to_local(ends)) - elapsed(to_local(starts)), 0)
+
+
+def park_business_durations(parks, now=None):
+    """
+    Calcule les durées ouvrées d'un ensemble de stationnements en une passe
+
+    Args:
+        parks (QuerySet): Les stationnements
+        now (datetime): Fin des stationnements en cours (défaut: maintenant)
+
+    Returns:
+        dict: La durée ouvrée (timedelta) de chaque stationnement, par identifiant
+    """
+    now = now or timezone.now()
+    rows = list(parks.values_list('id', 'arrival', 'departure'))
+    durations = business_durations([row[1] for row in rows], [row[2] or now for row in rows])
+
+    return {row[0]: timedelta(microseconds=int(us)) for row, us in zip(rows, durations)}
+
+
+def format_duration(duration):
+    """Formate une durée en heures et minutes (ex. 12h 05m)"""
+    total_minutes = duration // timedelta(minutes=1)
+    hours, minutes = divmod(total_minutes, 60)
+    return f"{hours}h {minutes:02d}m"
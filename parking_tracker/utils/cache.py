@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class RecognitionCache:
+    """
+    Cache disque des réponses PlateRecognizer, adressé par le contenu de l'image envoyée.
+    Une image déjà reconnue (relance après interruption, retraitement) ne coûte plus d'appel à l'API.
+    Les entrées les moins récemment utilisées sont évincées au-delà de la taille maximale.
+    """
+
+    def __init__(self, path, max_size=None):
+        """
+        Args:
+            path (str): Chemin du fichier SQLite du cache
+            max_size (int): Taille maximale des réponses conservées, en octets (None pour illimité)
+        """
+        self.path = str(path)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS recognition ('
+            ' key TEXT PRIMARY KEY,'
+            ' results TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' accessed REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS recognition_accessed ON recognition (accessed)')
+
+        # Taille totale des réponses, calculée à l'ouverture puis tenue à jour à chaque écriture
+        self.total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM recognition').fetchone()[0]
+
+    @staticmethod
+    def make_key(image_bytes):
+        """
+        Calcule la clé d'une image
+
+        Args:
+            image_bytes (bytes): Le contenu JPEG envoyé à l'API
+
+        Returns:
+            str: L'empreinte SHA-256 hexadécimale du contenu
+        """
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def get(self, key):
+        """
+        Renvoie la liste `results` enregistrée pour une clé, ou None si absente
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT results FROM recognition WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.connection.execute('UPDATE recognition SET accessed = ? WHERE key = ?', (time.time(), key))
+
+        return json.loads(row[0])
+
+    def set(self, key, results):
+        """
+        Enregistre la liste `results` (plaques et boîtes) renvoyée par l'API pour une clé
+        """
+        payload = json.dumps(results)
+        with self.lock:
+            row = self.connection.execute('SELECT size FROM recognition WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO recognition (key, results, size, accessed) VALUES (?, ?, ?, ?)',
+                (key, payload, len(payload), time.time())
+            )
+            self.total += len(payload) - (row[0] if row else 0)
+            self.evict()
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées tant que la taille maximale est dépassée"""
+        if not self.max_size:
+            return
+
+        if self.total <= self.max_size:
+            return
+
+        excess = self.total - self.max_size
+        freed = 0
+        keys = []
+        for key, size in self.connection.execute('SELECT key, size FROM recognition ORDER BY accessed'):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+
+        self.connection.executemany('DELETE FROM recognition WHERE key = ?', keys)
+        self.total -= freed
+
+    def close(self):
+        self.connection.close()
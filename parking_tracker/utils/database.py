@@ -0,0 +1,17 @@
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Applique settings.SQLITE_PRAGMAS à chaque nouvelle connexion SQLite (signal connection_created)
+
+    Args:
+        sender: Classe de la connexion
+        connection: La connexion créée
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
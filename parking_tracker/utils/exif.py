@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from PIL import Image
+from django.utils import timezone
+
+# Balises lues, par identifiant : seules celles-ci sont décodées
+DATETIME = 0x0132
+DATETIME_ORIGINAL = 0x9003
+OFFSET_TIME = 0x9010
+OFFSET_TIME_ORIGINAL = 0x9011
+SUBSEC_TIME = 0x9290
+SUBSEC_TIME_ORIGINAL = 0x9291
+
+# Pointeurs vers les sous-répertoires EXIF et GPS (ExifTags.IFD n'existe qu'à partir de Pillow 9.4)
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+# Marqueurs JPEG : début d'image, segment APP1 (EXIF), début des données d'image
+JPEG_SOI = b'\xff\xd8'
+JPEG_APP1 = 0xE1
+JPEG_SOS = 0xDA
+EXIF_HEADER = b'Exif\x00\x00'
+
+
+def read_metadata(photo_path):
+    """
+    Lit la date de prise de vue et les coordonnées GPS d'une photo.
+    Seul l'en-tête du fichier est lu : les pixels ne sont pas décodés. Pour un JPEG, le segment EXIF (APP1)
+    est lu directement, sans ouvrir l'image avec Pillow.
+
+    Args:
+        photo_path (str): Chemin de la photo
+
+    Returns:
+        dict: datetime (None si absente ou illisible), latitude et longitude (None si absentes)
+    """
+    exif = read_jpeg_exif(photo_path)
+    if exif is None:
+        with Image.open(photo_path) as img:
+            exif = img.getexif()
+
+    return metadata_from_exif(exif)
+
+
+def read_jpeg_exif(photo_path):
+    """
+    Lit le segment EXIF d'un JPEG en parcourant ses marqueurs jusqu'au début des données d'image
+
+    Returns:
+        PIL.Image.Exif: Les balises EXIF (vides si le JPEG n'en a pas), ou None si le fichier n'est pas un JPEG
+            ou que sa structure n'est pas reconnue
+    """
+    exif = Image.Exif()
+
+    with open(photo_path, 'rb') as f:
+        if f.read(2) != JPEG_SOI:
+            return None
+
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return exif
+            if header[0] != 0xFF:
+                # Structure inattendue (octets de remplissage...) : laisser Pillow lire le fichier
+                return None
+
+            marker = header[1]
+            length = int.from_bytes(header[2:4], 'big')
+            if marker == JPEG_SOS or length < 2:
+                return exif
+
+            if marker == JPEG_APP1:
+                segment = f.read(length - 2)
+                if segment.startswith(EXIF_HEADER):
+                    exif.load(segment[len(EXIF_HEADER):])
+                    return exif
+            else:
+                f.seek(length - 2, 1)
+
+
+def metadata_from_exif(exif):
+    """
+    Extrait la date de prise de vue et les coordonnées GPS des balises EXIF, en ne lisant que les balises utiles
+
+    Args:
+        exif (PIL.Image.Exif): Les balises EXIF
+
+    Returns:
+        dict: datetime, latitude et longitude
+    """
+    metadata = {'datetime': None, 'latitude': None, 'longitude': None}
+    if not exif:
+        return metadata
+
+    # Date de prise de vue de préférence, sinon date de dernière modification de l'image
+    exif_ifd = exif.get_ifd(EXIF_IFD) if EXIF_IFD in exif else {}
+    metadata['datetime'] = (
+        parse_exif_datetime(exif_ifd.get(DATETIME_ORIGINAL), exif_ifd.get(SUBSEC_TIME_ORIGINAL),
+                            exif_ifd.get(OFFSET_TIME_ORIGINAL))
+        or parse_exif_datetime(exif.get(DATETIME), exif_ifd.get(SUBSEC_TIME), exif_ifd.get(OFFSET_TIME))
+    )
+
+    if GPS_IFD in exif:
+        gps = exif.get_ifd(GPS_IFD)
+        if GPS_LATITUDE in gps and GPS_LONGITUDE in gps:
+            metadata['latitude'] = convert_gps_coordinate(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF, 'N'))
+            metadata['longitude'] = convert_gps_coordinate(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF, 'E'))
+
+    return metadata
+
+
+def parse_exif_datetime(value, subsec=None, offset=None):
+    """
+    Convertit une date EXIF (AAAA:MM:JJ HH:MM:SS) en datetime avec fuseau, sans strptime.
+    Sans décalage horaire enregistré, la photo est supposée prise à l'heure locale (settings.TIME_ZONE).
+
+    Args:
+        value (str): La date EXIF
+        subsec (str): Fractions de seconde (balise SubSecTime*), optionnel
+        offset (str): Décalage horaire ±HH:MM (balise OffsetTime*), optionnel
+
+    Returns:
+        datetime: La date avec fuseau, ou None si elle est absente ou illisible
+    """
+    if not value or len(value) < 19:
+        return None
+
+    try:
+        date_time = datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                             int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    except ValueError:
+        # Date vide ("    :  :     :  :  ") ou mal formée
+        return None
+
+    subsec = subsec.strip(' \x00') if subsec else ''
+    if subsec.isdigit():
+        date_time = date_time.replace(microsecond=int(subsec[:6].ljust(6, '0')))
+
+    offset = offset.strip(' \x00') if offset else ''
+    if len(offset) == 6 and offset[0] in '+-' and offset[3] == ':':
+        try:
+            delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+        except ValueError:
+            delta = None
+        if delta is not None:
+            return date_time.replace(tzinfo=dt_timezone(-delta if offset[0] == '-' else delta))
+
+    return timezone.make_aware(date_time)
+
+
+def convert_gps_coordinate(coordinate, ref):
+    """Convertit les coordonnées GPS (degrés, minutes, secondes) en degrés décimaux"""
+    try:
+        degrees, minutes, seconds = (float(value) for value in coordinate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+    decimal = degrees + minutes / 60 + seconds / 3600
+    if decimal != decimal:
+        # Dénominateur nul (NaN)
+        return None
+
+    if ref in ['S', 'W']:
+        decimal = -decimal
+
+    return decimal
@@ -0,0 +1,186 @@
+import csv
+import io
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Park, Photo
+from .business_hours import business_durations
+
+try:
+    # Format Parquet, si pyarrow est installé
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_FORMATS = ('csv', 'parquet')
+PARQUET_AVAILABLE = pa is not None
+
+# Colonnes exportées et leur type Parquet
+COLUMNS = {
+    'parks': (
+        ('id', 'int'), ('vehicle', 'int'), ('arrival', 'timestamp'), ('departure', 'timestamp'),
+        ('ongoing', 'bool'), ('duration_seconds', 'int'), ('business_seconds', 'int'),
+    ),
+    'photos': (
+        ('id', 'int'), ('vehicle', 'int'), ('batch', 'int'), ('date_time', 'timestamp'),
+        ('latitude', 'float'), ('longitude', 'float'), ('created', 'timestamp'),
+    ),
+}
+
+
+def export_queryset(table, start=None, end=None, batch=None, after_batch=None):
+    """
+    Sélectionne les lignes à exporter, triées par identifiant
+
+    Args:
+        table (str): parks ou photos
+        start (datetime): Début de la période (optionnel)
+        end (datetime): Fin de la période (optionnel)
+        batch (int): Lot de traitement (optionnel)
+        after_batch (int): Lots postérieurs à celui-ci seulement, pour un export incrémental (optionnel)
+
+    Returns:
+        QuerySet: Les lignes, sous forme de tuples (values_list)
+    """
+    batch_q = Q()
+    if batch is not None:
+        batch_q &= Q(batch=batch)
+    if after_batch is not None:
+        batch_q &= Q(batch__gt=after_batch)
+
+    if table == 'photos':
+        photos = Photo.objects.filter(batch_q)
+        if start:
+            photos = photos.filter(date_time__gte=start)
+        if end:
+            photos = photos.filter(date_time__lte=end)
+        return photos.order_by('id').values_list('id', 'vehicle', 'batch', 'date_time', 'latitude', 'longitude',
+                                                 'created')
+
+    # Stationnements qui recoupent la période
+    parks = Park.objects.all()
+    if start:
+        parks = parks.filter(Q(departure__isnull=True) | Q(departure__gte=start))
+    if end:
+        parks = parks.filter(arrival__lte=end)
+    if batch_q:
+        # Stationnements pendant lesquels le véhicule a été photographié par les lots demandés
+        parks = parks.filter(Exists(Photo.objects.filter(
+            batch_q, vehicle=OuterRef('vehicle'), date_time__gte=OuterRef('arrival'),
+            date_time__lte=Coalesce(OuterRef('departure'), F('date_time')),
+        )))
+    return parks.order_by('id').values_list('id', 'vehicle', 'arrival', 'departure')
+
+
+def iter_chunks(table, queryset, chunk_size=5000, now=None):
+    """
+    Lit les lignes par paquets, sans charger toute la table en mémoire, et ajoute les durées des stationnements
+
+    Args:
+        table (str): parks ou photos
+        queryset (QuerySet): Les lignes (export_queryset)
+        chunk_size (int): Nombre de lignes par paquet
+        now (datetime): Fin des stationnements en cours (défaut: maintenant)
+
+    Yields:
+        list: Paquet de lignes, dans l'ordre des colonnes de COLUMNS[table]
+    """
+    now = now or timezone.now()
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        if table == 'photos':
+            yield [
+                (photo_id, vehicle_id, batch_id, date_time,
+                 None if latitude is None else float(latitude), None if longitude is None else float(longitude),
+                 created)
+                for photo_id, vehicle_id, batch_id, date_time, latitude, longitude, created in chunk
+            ]
+            continue
+
+        ends = [departure or now for _, _, _, departure in chunk]
+        durations = business_durations([row[2] for row in chunk], ends)
+        yield [
+            (park_id, vehicle_id, arrival, departure, departure is None,
+             int((end - arrival).total_seconds()), int(us) // 10 ** 6)
+            for (park_id, vehicle_id, arrival, departure), end, us in zip(chunk, ends, durations)
+        ]
+
+
+def iter_csv(table, chunks):
+    """Génère le fichier CSV au fil des paquets (en-tête compris), dates au format ISO 8601"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in COLUMNS[table]])
+
+    for chunk in chunks:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # En-tête seul si aucune ligne n'est exportée
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class ParquetSink(io.RawIOBase):
+    """Fichier en mémoire vidé à chaque groupe de lignes, pour diffuser un fichier Parquet au fil de l'eau"""
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def iter_parquet(table, chunks):
+    """Génère le fichier Parquet au fil des paquets, un groupe de lignes par paquet (pyarrow doit être installé)"""
+    types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'timestamp': pa.timestamp('us', tz='UTC')}
+    schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS[table]])
+
+    sink = ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_data(table, export_format, chunks):
+    """Génère le contenu exporté (str en CSV, bytes en Parquet)"""
+    if export_format == 'parquet':
+        return iter_parquet(table, chunks)
+    return iter_csv(table, chunks)
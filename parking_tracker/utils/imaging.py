@@ -0,0 +1,121 @@
+import io
+from concurrent.futures import Future
+
+from PIL import Image
+
+from .anonymize import blur_boxes, encode_archive
+
+# Dimensions maximales des images envoyées à l'API
+MAX_WIDTH = 1980
+MAX_HEIGHT = 1080
+
+# Qualité JPEG des images envoyées à l'API
+UPLOAD_QUALITY = 85
+
+
+def fit_size(size, max_width=MAX_WIDTH, max_height=MAX_HEIGHT):
+    """
+    Calcule les dimensions d'une image redimensionnée en conservant le ratio largeur:hauteur
+    pour qu'elle tienne dans les dimensions maximales spécifiées.
+    """
+    original_width, original_height = size
+
+    # Calcul du ratio de redimensionnement
+    width_ratio = max_width / original_width
+    height_ratio = max_height / original_height
+
+    # Prendre le plus petit ratio pour que l'image tienne dans les limites
+    resize_ratio = min(width_ratio, height_ratio)
+
+    # Si l'image est déjà plus petite, ne pas l'agrandir
+    if resize_ratio >= 1:
+        return size
+
+    # Nouvelles dimensions
+    return int(original_width * resize_ratio), int(original_height * resize_ratio)
+
+
+def load_resized(img, max_width=MAX_WIDTH, max_height=MAX_HEIGHT):
+    """
+    Décode une image ouverte en RGB, redimensionnée pour tenir dans les dimensions maximales.
+    Pour un JPEG, le décodeur travaille directement à échelle réduite (1/2, 1/4 ou 1/8, DCT)
+    sans descendre sous la taille cible ; le filtre LANCZOS ne traite alors qu'une image déjà réduite.
+    """
+    new_size = fit_size(img.size, max_width, max_height)
+    if new_size != img.size:
+        img.draft('RGB', new_size)
+
+    # Convertir en RGB si nécessaire (pour les images avec transparence)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    else:
+        img.load()
+
+    if img.size != new_size:
+        img = img.resize(new_size, Image.LANCZOS)
+
+    return img
+
+
+def encode_image(image, format='JPEG', quality=UPLOAD_QUALITY):
+    """
+    Encode une image PIL en JPEG, tel qu'envoyé à l'API.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, quality=quality)
+    return buffer.getvalue()
+
+
+def prepare_photo(photo_path):
+    """
+    Décode une photo à taille réduite et l'encode pour l'API.
+    Exécutée dans un processus de travail. Les pixels de l'image réduite sont renvoyés avec le JPEG :
+    la photo archivée en est tirée directement, sans décoder ni recompresser le JPEG envoyé.
+    Ils ne sont conservés que le temps de la reconnaissance (voir archive_photo).
+
+    Args:
+        photo_path (str): Chemin de la photo d'origine
+
+    Returns:
+        tuple: L'image redimensionnée encodée en JPEG (bytes), et ses pixels RGB (dimensions, bytes)
+    """
+    with Image.open(photo_path) as img:
+        image = load_resized(img)
+    return encode_image(image), (image.size, image.tobytes())
+
+
+def archive_photo(pixels, boxes, output_format='JPEG', quality=75, progressive=False, radius=6):
+    """
+    Floute les plaques d'une image redimensionnée et l'encode dans le format d'archivage.
+    Exécutée dans un processus de travail, dès que les plaques sont connues : seul le fichier compressé
+    est ensuite conservé, jusqu'à ce que la photo enregistrée en base lui donne son nom.
+
+    Args:
+        pixels (tuple): Dimensions et pixels RGB de l'image redimensionnée (voir prepare_photo)
+        boxes (list): Zones des plaques détectées
+        output_format (str): Format d'archivage (voir encode_archive)
+        quality (int): Qualité de compression
+        progressive (bool): JPEG progressif
+        radius (int): Rayon du flou gaussien
+
+    Returns:
+        bytes: Le contenu du fichier à archiver
+    """
+    size, data = pixels
+    image = Image.frombytes('RGB', size, data)
+
+    blur_boxes(image, boxes, radius)
+    return encode_archive(image, output_format, quality, progressive)
+
+
+def run_inline(fn, *args):
+    """
+    Exécute une tâche dans le processus courant et renvoie son résultat sous forme de Future,
+    comme le ferait un pool de processus
+    """
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Bornes des histogrammes de durée, en secondes (format Prometheus)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def timed_call(fn, *args):
+    """
+    Exécute une fonction et renvoie (résultat, durée en secondes).
+    Utilisable dans un processus de travail, où les métriques du processus principal ne sont pas accessibles.
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class Metrics:
+    """
+    Chronomètres par étape et compteurs d'un traitement, partagés entre les threads.
+    Exportables en JSON ou au format texte Prometheus (collecteur textfile de node_exporter).
+    """
+
+    def __init__(self, prefix):
+        """
+        Args:
+            prefix (str): Préfixe des métriques Prometheus (ex. process_photos)
+        """
+        self.prefix = prefix
+        self.durations = defaultdict(list)
+        self.counters = defaultdict(int)
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage):
+        """Chronomètre le bloc et l'enregistre pour l'étape donnée"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.durations[stage].append(seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def set(self, name, value):
+        with self.lock:
+            self.counters[name] = value
+
+    def summary(self):
+        """
+        Résume les mesures
+
+        Returns:
+            dict: Compteurs, et pour chaque étape nombre d'appels, total, p50, p95 et histogramme
+        """
+        with self.lock:
+            durations = {stage: sorted(values) for stage, values in self.durations.items()}
+            counters = dict(self.counters)
+
+        stages = {}
+        for stage, values in durations.items():
+            stages[stage] = {
+                'count': len(values),
+                'total_seconds': sum(values),
+                'p50_seconds': percentile(values, 50),
+                'p95_seconds': percentile(values, 95),
+                'buckets': {str(bound): sum(1 for v in values if v <= bound) for bound in BUCKETS},
+            }
+
+        return {
+            'started': self.started,
+            'elapsed_seconds': time.time() - self.started,
+            'counters': counters,
+            'stages': stages,
+        }
+
+    def to_prometheus(self):
+        """Renvoie les mesures au format texte Prometheus"""
+        summary = self.summary()
+        name = f'{self.prefix}_stage_seconds'
+        lines = [
+            f'# HELP {name} Durée des étapes du traitement',
+            f'# TYPE {name} histogram',
+        ]
+        for stage, values in summary['stages'].items():
+            for bound, count in values['buckets'].items():
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {values["count"]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {values["total_seconds"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {values["count"]}')
+
+        for counter, value in summary['counters'].items():
+            lines.append(f'# TYPE {self.prefix}_{counter} gauge')
+            lines.append(f'{self.prefix}_{counter} {value}')
+
+        lines.append(f'# TYPE {self.prefix}_elapsed_seconds gauge')
+        lines.append(f'{self.prefix}_elapsed_seconds {summary["elapsed_seconds"]:.3f}')
+        lines.append(f'# TYPE {self.prefix}_last_run_timestamp_seconds gauge')
+        lines.append(f'{self.prefix}_last_run_timestamp_seconds {time.time():.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Écrit les mesures dans un fichier, de façon atomique : JSON si l'extension est .json,
+        format texte Prometheus sinon (ex. .prom)
+        """
+        if str(path).endswith('.json'):
+            content = json.dumps(self.summary(), indent=2)
+        else:
+            content = self.to_prometheus()
+
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+
+def percentile(values, q):
+    """Centile d'une liste triée, par interpolation linéaire"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
@@ -0,0 +1,310 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import cached_property
+from itertools import chain
+
+import numpy as np
+from django.db import connections
+from django.db.models import BigIntegerField, Func, Min, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+PERIODS = ('hour', 'day')
+WEEKDAYS = ('lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche')
+HOUR = 3600
+# Nombre de lignes lues à la fois par park_intervals
+FETCH_SIZE = 50000
+
+
+class EpochSeconds(Func):
+    """Date convertie en secondes depuis le 1er janvier 1970 (UTC) par la base, sans créer d'objets datetime"""
+    template = 'CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)'
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # unixepoch() (SQLite 3.38+) est près de deux fois plus rapide que strftime('%s')
+        if connection.Database.sqlite_version_info >= (3, 38):
+            return self.as_sql(compiler, connection, template='unixepoch(%(expressions)s)', **extra_context)
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+                           **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+def to_seconds(moment):
+    """Convertit un datetime avec fuseau en secondes depuis le 1er janvier 1970"""
+    return int(moment.timestamp())
+
+
+def from_seconds(seconds):
+    """Convertit des secondes depuis le 1er janvier 1970 en datetime à l'heure locale"""
+    return timezone.localtime(datetime.fromtimestamp(int(seconds), dt_timezone.utc))
+
+
+def parse_moment(value):
+    """
+    Lit une date (AAAA-MM-JJ) ou une date et heure ISO 8601, à l'heure locale si aucun fuseau n'est indiqué
+
+    Returns:
+        datetime: La date avec fuseau, ou None si la valeur est vide
+
+    Raises:
+        ValueError: Si la valeur n'est pas une date
+    """
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def park_intervals(parks, now=None):
+    """
+    Lit les périodes de stationnement, converties en secondes par la base.
+    Les lignes sont lues par paquets directement depuis le curseur, sans passer par les itérateurs de l'ORM.
+
+    Args:
+        parks (QuerySet): Les stationnements
+        now (datetime): Fin des stationnements en cours (défaut: maintenant)
+
+    Returns:
+        tuple: Arrivées et départs (numpy.ndarray int64, en secondes)
+    """
+    now = now or timezone.now()
+    rows = parks.order_by().values_list(
+        EpochSeconds('arrival'),
+        Coalesce(EpochSeconds('departure'), Value(to_seconds(now)), output_field=BigIntegerField()),
+    )
+    sql, params = rows.query.get_compiler(rows.db).as_sql()
+
+    chunks = [np.zeros(0, dtype=np.int64)]
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while chunk := cursor.fetchmany(FETCH_SIZE):
+            chunks.append(np.fromiter(chain.from_iterable(chunk), dtype=np.int64, count=2 * len(chunk)))
+
+    intervals = np.concatenate(chunks).reshape(-1, 2)
+    return intervals[:, 0], intervals[:, 1]
+
+
+class Occupancy:
+    """
+    Occupation de la rue au fil du temps, calculée par balayage des arrivées et départs triés.
+    Un véhicule est présent de son arrivée à son départ inclus (heures de la première et de la dernière photo).
+    Toutes les opérations sont vectorisées : tri puis recherches dichotomiques (numpy.searchsorted).
+    """
+
+    def __init__(self, arrivals, departures):
+        """
+        Args:
+            arrivals (numpy.ndarray): Arrivées, en secondes
+            departures (numpy.ndarray): Départs, en secondes
+        """
+        self.arrivals = np.sort(np.asarray(arrivals, dtype=np.int64))
+        self.departures = np.sort(np.asarray(departures, dtype=np.int64))
+        # Sommes cumulées, pour intégrer l'occupation sur une période
+        self.arrivals_sum = np.concatenate(([0], np.cumsum(self.arrivals)))
+        self.departures_sum = np.concatenate(([0], np.cumsum(self.departures)))
+
+    def __len__(self):
+        return len(self.arrivals)
+
+    def at(self, instants):
+        """Nombre de véhicules présents à chaque instant"""
+        return (np.searchsorted(self.arrivals, instants, 'right')
+                - np.searchsorted(self.departures, instants, 'left'))
+
+    @cached_property
+    def curve(self):
+        """
+        Courbe d'occupation : valeur à chaque arrivée ou départ, et valeur jusqu'à l'événement suivant.
+        Les événements sont triés en une passe : à instant égal, les arrivées (clé paire) précèdent les départs.
+
+        Returns:
+            tuple: Instants des événements, occupation à l'instant, occupation juste après (numpy.ndarray)
+        """
+        keys = np.sort(np.concatenate((self.arrivals * 2, self.departures * 2 + 1)))
+        moments = keys >> 1
+        arrival = (keys & 1) == 0
+        if not len(keys):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        # Premier événement de chaque instant
+        groups = np.flatnonzero(np.concatenate(([True], moments[1:] != moments[:-1])))
+        running = np.cumsum(np.where(arrival, 1, -1))
+        after = running[np.concatenate((groups[1:], [len(keys)])) - 1]
+        before = np.concatenate(([0], after[:-1]))
+        at = before + np.add.reduceat(arrival.astype(np.int64), groups)
+
+        return moments[groups], at, after
+
+    def integral(self, instants):
+        """Temps de présence cumulé de tous les véhicules (en secondes) jusqu'à chaque instant"""
+        arrived = np.searchsorted(self.arrivals, instants, 'right')
+        departed = np.searchsorted(self.departures, instants, 'right')
+        return ((arrived - departed) * instants.astype(np.int64)
+                - self.arrivals_sum[arrived] + self.departures_sum[departed])
+
+    def buckets(self, edges):
+        """
+        Occupation par période
+
+        Args:
+            edges (numpy.ndarray): Bornes des périodes, en secondes (n + 1 bornes pour n périodes)
+
+        Returns:
+            dict: Pour chaque période, stationnements présents (present), nombre moyen de véhicules pondéré
+                par le temps (average) et maximum simultané (peak)
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        starts, ends = edges[:-1], edges[1:]
+
+        present = (np.searchsorted(self.arrivals, ends, 'left')
+                   - np.searchsorted(self.departures, starts, 'left'))
+        average = np.diff(self.integral(edges)) / np.maximum(ends - starts, 1)
+
+        # Maximum : occupation au début de la période, ou à un événement de la période
+        peak = self.at(starts)
+        times, at, _ = self.curve
+        first = np.searchsorted(times, starts, 'left')
+        last = np.searchsorted(times, ends, 'left')
+        busy = last > first
+        if busy.any():
+            # Les périodes sans événement ne séparent pas deux segments consécutifs de reduceat
+            peak[busy] = np.maximum(peak[busy], np.maximum.reduceat(at[:last[busy][-1]], first[busy]))
+
+        return {'present': present, 'average': average, 'peak': peak}
+
+    def peaks(self, limit=5):
+        """
+        Détecte les pics d'occupation : maxima locaux de la courbe, du plus haut au plus bas
+
+        Args:
+            limit (int): Nombre maximal de pics
+
+        Returns:
+            list: Tuples (début, fin en secondes, nombre de véhicules)
+        """
+        if not len(self) or limit <= 0:
+            return []
+
+        times, at, after = self.curve
+        # Valeurs successives de la courbe : à l'instant de chaque événement, puis jusqu'au suivant
+        values = np.empty(2 * len(times), dtype=np.int64)
+        values[0::2], values[1::2] = at, after
+        instants = np.repeat(times, 2)
+
+        changes = np.flatnonzero(np.diff(values)) + 1
+        starts = np.concatenate(([0], changes))
+        levels = values[starts]
+        ends = instants[np.concatenate((changes, [len(values) - 1]))]
+
+        previous = np.concatenate(([0], levels[:-1]))
+        following = np.concatenate((levels[1:], [0]))
+        found = np.flatnonzero((levels > previous) & (levels > following))
+        if len(found) > limit:
+            # Seuls les plus hauts sont triés : à égalité de niveau, les premiers dans le temps
+            threshold = np.partition(levels[found], len(found) - limit)[len(found) - limit]
+            found = found[levels[found] >= threshold]
+        found = found[np.lexsort((found, -levels[found]))][:limit]
+
+        return [(int(instants[starts[i]]), int(ends[i]), int(levels[i])) for i in found]
+
+
+def bucket_edges(start, end, period):
+    """
+    Bornes des périodes entre deux instants : heures pleines, ou minuits à l'heure locale (settings.TIME_ZONE).
+    La première et la dernière période sont tronquées à l'intervalle demandé.
+
+    Args:
+        start (datetime): Début
+        end (datetime): Fin
+        period (str): hour ou day
+
+    Returns:
+        numpy.ndarray: Les bornes, en secondes
+    """
+    first, last = to_seconds(start), to_seconds(end)
+    if period == 'hour':
+        # Les fuseaux à décalage entier gardent les heures pleines UTC comme heures locales
+        inner = np.arange((first // HOUR + 1) * HOUR, last, HOUR, dtype=np.int64)
+    else:
+        inner = []
+        day = timezone.localtime(start).date() + timedelta(days=1)
+        while (midnight := to_seconds(timezone.make_aware(datetime.combine(day, time())))) < last:
+            inner.append(midnight)
+            day += timedelta(days=1)
+
+    return np.concatenate(([first], np.asarray(inner, dtype=np.int64), [last])) if last > first \
+        else np.array([first], dtype=np.int64)
+
+
+def weekday_averages(occupancy, start, end):
+    """
+    Nombre moyen de véhicules présents par jour de la semaine (heure locale), pondéré par la durée des journées
+
+    Returns:
+        list: Une moyenne par jour, du lundi au dimanche (None si la période ne contient pas ce jour)
+    """
+    edges = bucket_edges(start, end, 'day')
+    if len(edges) < 2:
+        return [None] * 7
+
+    average = occupancy.buckets(edges)['average']
+    lengths = np.diff(edges)
+    weekdays = np.array([from_seconds(edge).weekday() for edge in edges[:-1]])
+
+    time_weighted = np.bincount(weekdays, weights=average * lengths, minlength=7)
+    covered = np.bincount(weekdays, weights=lengths, minlength=7)
+    return [float(total / length) if length else None for total, length in zip(time_weighted, covered)]
+
+
+def occupancy_report(parks, period='day', start=None, end=None, peaks=5, now=None):
+    """
+    Calcule l'occupation de la rue : courbe par période, pics et moyennes par jour de la semaine
+
+    Args:
+        parks (QuerySet): Les stationnements
+        period (str): Durée des périodes, hour ou day (défaut: day)
+        start (datetime): Début de l'analyse (défaut: première arrivée)
+        end (datetime): Fin de l'analyse (défaut: maintenant)
+        peaks (int): Nombre de pics à détecter
+        now (datetime): Fin des stationnements en cours (défaut: maintenant)
+
+    Returns:
+        dict: Le rapport, sérialisable en JSON
+    """
+    now = now or timezone.now()
+    end = end or now
+    if start is None:
+        start = parks.aggregate(first=Min('arrival'))['first'] or end
+
+    # Seuls les stationnements qui recoupent la période sont lus
+    parks = parks.filter(Q(departure__isnull=True) | Q(departure__gte=start), arrival__lte=end)
+    arrivals, departures = park_intervals(parks, now)
+    first, last = to_seconds(start), to_seconds(end)
+    occupancy = Occupancy(np.clip(arrivals, first, last), np.clip(departures, first, last))
+
+    edges = bucket_edges(start, end, period)
+    buckets = occupancy.buckets(edges)
+
+    return {
+        'period': period,
+        'start': timezone.localtime(start).isoformat(),
+        'end': timezone.localtime(end).isoformat(),
+        'parks': len(occupancy),
+        'buckets': [
+            {'start': from_seconds(edge).isoformat(), 'present': int(present), 'average': round(float(average), 2),
+             'peak': int(peak)}
+            for edge, present, average, peak in zip(edges[:-1], buckets['present'], buckets['average'],
+                                                    buckets['peak'])
+        ],
+        'peaks': [
+            {'start': from_seconds(first).isoformat(), 'end': from_seconds(last).isoformat(), 'vehicles': vehicles}
+            for first, last, vehicles in occupancy.peaks(peaks)
+        ],
+        'weekdays': [
+            {'weekday': name, 'average': None if average is None else round(average, 2)}
+            for name, average in zip(WEEKDAYS, weekday_averages(occupancy, start, end))
+        ],
+    }
@@ -0,0 +1,204 @@
+import base64
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class PlateRecognizerError(Exception):
+    """
+    Erreur renvoyée par l'API PlateRecognizer (statut HTTP inattendu ou erreur réseau)
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RateLimiter:
+    """
+    Seau à jetons (token bucket) partagé entre les threads, pour respecter
+    le nombre d'appels par seconde autorisé par le forfait de l'API
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate (float): Nombre d'appels autorisés par seconde
+            burst (int): Nombre maximal d'appels consécutifs sans attente (défaut: max(1, rate))
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'un jeton soit disponible, puis le consomme"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class PlateRecognizerClient:
+    """
+    Client réutilisable pour l'API PlateRecognizer : connexions persistantes (keep-alive),
+    délais d'attente, nouvelles tentatives avec attente exponentielle sur 429/5xx
+    et limitation du débit d'appels
+    """
+
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    UPLOAD_MODES = ('multipart', 'base64')
+
+    def __init__(self, api_key, url=None, timeout=None, max_retries=None, backoff=None, rate_limit=None,
+                 pool_size=10, cache=None, upload_mode=None):
+        """
+        Args:
+            api_key (str): Clé API PlateRecognizer
+            url (str): URL de l'API (défaut: settings.PLATE_RECOGNIZER_URL)
+            timeout (tuple): Délais (connexion, lecture) en secondes (défaut: settings.PLATE_RECOGNIZER_TIMEOUT)
+            max_retries (int): Nombre de nouvelles tentatives (défaut: settings.PLATE_RECOGNIZER_MAX_RETRIES)
+            backoff (float): Attente initiale en secondes, doublée à chaque tentative
+                (défaut: settings.PLATE_RECOGNIZER_BACKOFF)
+            rate_limit (float): Appels par seconde autorisés, None pour illimité
+                (défaut: settings.PLATE_RECOGNIZER_RATE_LIMIT)
+            pool_size (int): Nombre de connexions conservées ouvertes
+            cache (RecognitionCache): Cache des réponses, consulté avant chaque appel (optionnel)
+            upload_mode (str): 'multipart' pour envoyer les octets JPEG tels quels, 'base64' pour un champ
+                de formulaire encodé, 33 % plus volumineux (défaut: settings.PLATE_RECOGNIZER_UPLOAD_MODE)
+        """
+        self.url = url or settings.PLATE_RECOGNIZER_URL
+        self.timeout = timeout if timeout is not None else getattr(settings, 'PLATE_RECOGNIZER_TIMEOUT', (5, 30))
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'PLATE_RECOGNIZER_MAX_RETRIES', 5)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'PLATE_RECOGNIZER_BACKOFF', 0.5)
+
+        if rate_limit is None:
+            rate_limit = getattr(settings, 'PLATE_RECOGNIZER_RATE_LIMIT', None)
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Token {api_key}'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.upload_mode = upload_mode or getattr(settings, 'PLATE_RECOGNIZER_UPLOAD_MODE', 'multipart')
+        if self.upload_mode not in self.UPLOAD_MODES:
+            raise ValueError(f'Mode d\'envoi inconnu : {self.upload_mode}')
+
+        self.cache = cache
+        # Compteur partagé par les threads d'appel
+        self.retries = 0
+        self.retries_lock = threading.Lock()
+
+    def recognize_image(self, image_bytes):
+        """
+        Reconnaît les plaques d'une image JPEG, en consultant d'abord le cache
+
+        Args:
+            image_bytes (bytes): Le contenu JPEG à analyser
+
+        Returns:
+            list: La liste `results` de l'API (plaque et boîte de chaque détection)
+
+        Raises:
+            PlateRecognizerError: Si l'API répond en erreur ou reste injoignable après toutes les tentatives
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(image_bytes)
+            results = self.cache.get(key)
+            if results is not None:
+                return results
+
+        if self.upload_mode == 'base64':
+            img_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            results = self.recognize(data={'upload': img_base64})['results']
+        else:
+            # Fichier multipart : les octets JPEG sont envoyés tels quels, sans encodage base64
+            # (requests les recopie dans le corps de la requête, comme pour tout formulaire multipart)
+            results = self.recognize(files={'upload': ('upload.jpg', image_bytes, 'image/jpeg')})['results']
+
+        if self.cache is not None:
+            self.cache.set(key, results)
+
+        return results
+
+    def recognize(self, data=None, files=None):
+        """
+        Envoie une image à l'API et renvoie la réponse décodée
+
+        Args:
+            data (dict): Champs du formulaire
+            files (dict): Fichiers à envoyer en multipart
+
+        Returns:
+            dict: La réponse JSON de l'API
+
+        Raises:
+            PlateRecognizerError: Si l'API répond en erreur ou reste injoignable après toutes les tentatives
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+
+            retry_after = None
+            try:
+                response = self.session.post(self.url, data=data, files=files, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = PlateRecognizerError(f'API PlateRecognizer injoignable : {e}')
+            else:
+                if response.status_code in (200, 201):
+                    return response.json()
+
+                error = PlateRecognizerError(f'Erreur de l\'API PlateRecognizer: {response.status_code}',
+                                             response.status_code)
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    raise error
+                retry_after = response.headers.get('Retry-After')
+
+            if attempt >= self.max_retries:
+                raise error
+
+            with self.retries_lock:
+                self.retries += 1
+            time.sleep(self.retry_delay(attempt, retry_after))
+            attempt += 1
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Calcule l'attente avant la prochaine tentative (Retry-After prioritaire, sinon exponentielle)"""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+
+        delay = self.backoff * (2 ** attempt)
+        # Léger aléa pour éviter que les threads ne relancent tous en même temps
+        return delay + random.uniform(0, delay / 2)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,13 +2,175 @@ from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.backends import default_backend
 import base64
+import hashlib
 
 
 class RGPD:
     """
     Une classe pour les opérations de chiffrement et déchiffrement RSA
+
+    Les méthodes statiques rechargent la clé à chaque appel. Pour traiter de nombreuses plaques,
+    utiliser un contexte lié à la clé publique (RGPD.from_public_key), qui ne la charge qu'une fois.
     """
 
+    OAEP_PADDING = padding.OAEP(
+        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+        algorithm=hashes.SHA256(),
+        label=None
+    )
+
+    def __init__(self, public_key, public_key_pem, private_key=None):
+        """
+        Args:
+            public_key (RSAPublicKey): La clé publique chargée
+            public_key_pem (bytes): La clé publique au format PEM
+            private_key (RSAPrivateKey): La clé privée chargée, pour déchiffrer (optionnel)
+        """
+        self.public_key = public_key
+        self.private_key = private_key
+        # Empreinte de la clé publique, préfixe commun à toutes les empreintes de plaques
+        self.key_hash = hashlib.sha256(public_key_pem).digest()
+        self.fingerprint_prefix = hashlib.sha256(self.key_hash)
+
+    @classmethod
+    def from_public_key(cls, public_key_pem):
+        """
+        Crée un contexte de chiffrement lié à une clé publique, chargée et hachée une seule fois
+
+        Args:
+            public_key_pem (bytes): La clé publique au format PEM
+
+        Returns:
+            RGPD: Le contexte exposant fingerprint(), fingerprint_many() et encrypt()
+
+        Raises:
+            ValueError: Si la clé n'est pas une clé publique RSA
+        """
+        public_key = serialization.load_pem_public_key(
+            public_key_pem,
+            backend=default_backend()
+        )
+        if not isinstance(public_key, rsa.RSAPublicKey):
+            raise ValueError("La clé publique chargée n'est pas une clé RSA")
+
+        return cls(public_key, public_key_pem)
+
+    @classmethod
+    def from_public_key_file(cls, file_path):
+        """
+        Crée un contexte de chiffrement depuis un fichier PEM. La clé est lue, validée et
+        chargée en une seule analyse, contrairement à load_key_from_file suivi de from_public_key.
+
+        Args:
+            file_path (str): Chemin vers le fichier de clé publique
+
+        Returns:
+            RGPD: Le contexte exposant fingerprint(), fingerprint_many() et encrypt()
+
+        Raises:
+            ValueError: Si le fichier ne contient pas une clé publique RSA valide au format PEM
+            FileNotFoundError: Si le fichier n'existe pas
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                key_data = f.read()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Le fichier {file_path} n'existe pas")
+
+        if not key_data.startswith(b'-----BEGIN'):
+            raise ValueError("Le fichier ne contient pas une clé au format PEM")
+        if b'PUBLIC KEY' not in key_data:
+            raise ValueError("Le fichier ne contient pas de clé publique RSA au format PEM")
+
+        try:
+            return cls.from_public_key(key_data)
+        except Exception as e:
+            raise ValueError(f"Impossible de charger la clé publique RSA : {str(e)}")
+
+    @classmethod
+    def from_private_key(cls, private_key_pem, password=None):
+        """
+        Crée un contexte de déchiffrement lié à une clé privée. La dérivation du mot de passe,
+        coûteuse, n'est effectuée qu'une seule fois.
+
+        Args:
+            private_key_pem (bytes): La clé privée au format PEM
+            password (str): Le mot de passe de la clé privée (optionnel)
+
+        Returns:
+            RGPD: Le contexte exposant decrypt() en plus des opérations de la clé publique
+
+        Raises:
+            ValueError: Si la clé n'est pas une clé privée RSA ou si le mot de passe est erroné
+        """
+        key_password = password.encode() if password else None
+        private_key = serialization.load_pem_private_key(
+            private_key_pem,
+            password=key_password,
+            backend=default_backend()
+        )
+        if not isinstance(private_key, rsa.RSAPrivateKey):
+            raise ValueError("La clé privée chargée n'est pas une clé RSA")
+
+        public_key = private_key.public_key()
+        public_key_pem = public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return cls(public_key, public_key_pem, private_key)
+
+    def fingerprint(self, text):
+        """
+        Génère l'empreinte déterministe d'un texte (identique à generate_fingerprint)
+
+        Args:
+            text (str): Le texte pour lequel générer l'empreinte
+
+        Returns:
+            str: L'empreinte encodée en base64
+        """
+        combined_hash = self.fingerprint_prefix.copy()
+        combined_hash.update(hashlib.sha256(text.encode('utf-8')).digest())
+        return base64.b64encode(combined_hash.digest()).decode('utf-8')
+
+    def fingerprint_many(self, texts):
+        """
+        Génère les empreintes d'une liste de textes
+
+        Args:
+            texts (list): Les textes pour lesquels générer une empreinte
+
+        Returns:
+            list: Les empreintes, dans l'ordre des textes
+        """
+        return [self.fingerprint(text) for text in texts]
+
+    def encrypt(self, text):
+        """
+        Chiffre un texte avec la clé publique du contexte (identique à encrypt_text)
+
+        Args:
+            text (str): Le texte à chiffrer
+
+        Returns:
+            str: Le texte chiffré encodé en base64
+        """
+        encrypted_text = self.public_key.encrypt(text.encode('utf-8'), self.OAEP_PADDING)
+        return base64.b64encode(encrypted_text).decode('utf-8')
+
+    def decrypt(self, encrypted_text_b64):
+        """
+        Déchiffre un texte avec la clé privée du contexte (identique à decrypt_text)
+
+        Args:
+            encrypted_text_b64 (str): Le texte chiffré encodé en base64
+
+        Returns:
+            str: Le texte déchiffré
+        """
+        encrypted_text = base64.b64decode(encrypted_text_b64.encode('utf-8'))
+        return self.private_key.decrypt(encrypted_text, self.OAEP_PADDING).decode('utf-8')
+
     @staticmethod
     def generate_key_pair(key_size=2048, password=None):
         """
@@ -62,24 +224,7 @@ class RGPD:
         Returns:
             str: Le texte chiffré encodé en base64
         """
-        # Chargement de la clé publique
-        public_key = serialization.load_pem_public_key(
-            public_key_pem,
-            backend=default_backend()
-        )
-
-        # Chiffrement du texte
-        encrypted_text = public_key.encrypt(
-            text.encode('utf-8'),
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-
-        # Encodage en base64 pour faciliter la manipulation
-        return base64.b64encode(encrypted_text).decode('utf-8')
+        return RGPD.from_public_key(public_key_pem).encrypt(text)
 
     @staticmethod
     def decrypt_text(encrypted_text_b64, private_key_pem, password=None):
@@ -94,28 +239,7 @@ class RGPD:
         Returns:
             str: Le texte déchiffré
         """
-        # Décodage du base64
-        encrypted_text = base64.b64decode(encrypted_text_b64.encode('utf-8'))
-
-        # Chargement de la clé privée
-        key_password = password.encode() if password else None
-        private_key = serialization.load_pem_private_key(
-            private_key_pem,
-            password=key_password,
-            backend=default_backend()
-        )
-
-        # Déchiffrement du texte
-        decrypted_text = private_key.decrypt(
-            encrypted_text,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-
-        return decrypted_text.decode('utf-8')
+        return RGPD.from_private_key(private_key_pem, password).decrypt(encrypted_text_b64)
 
     @staticmethod
     def load_key_from_file(file_path, password=None):
@@ -237,30 +361,36 @@ class RGPD:
         Returns:
             str: L'empreinte encodée en base64 (constante pour un texte donné)
         """
-        # Chargement de la clé publique
-        public_key = serialization.load_pem_public_key(
-            public_key_pem,
-            backend=default_backend()
-        )
+        return RGPD.from_public_key(public_key_pem).fingerprint(text)
+
+# Contexte de déchiffrement propre à chaque processus de travail (voir init_decryption_worker)
+worker_context = None
 
-        # Génération de l'empreinte de la clé publique
-        key_fingerprint = hashes.Hash(hashes.SHA256(), backend=default_backend())
-        key_fingerprint.update(public_key_pem)
-        key_hash = key_fingerprint.finalize()
 
-        # Génération du hash du texte
-        text_hash = hashes.Hash(hashes.SHA256(), backend=default_backend())
-        text_hash.update(text.encode('utf-8'))
-        text_digest = text_hash.finalize()
+def init_decryption_worker(private_key_pem, password=None):
+    """
+    Initialise un processus de travail : la clé privée n'y est chargée qu'une fois
+
+    Args:
+        private_key_pem (bytes): La clé privée au format PEM
+        password (str): Le mot de passe de la clé privée (optionnel)
+    """
+    global worker_context
+    worker_context = RGPD.from_private_key(private_key_pem, password)
+
 
-        # Combinaison des deux hash pour créer une empreinte unique
-        combined_hash = hashes.Hash(hashes.SHA256(), backend=default_backend())
-        combined_hash.update(key_hash)
-        combined_hash.update(text_digest)
-        combined_digest = combined_hash.finalize()
+def decrypt_rows(rows):
+    """
+    Déchiffre un paquet de lignes (identifiant, texte chiffré) dans un processus de travail
+
+    Args:
+        rows (list): Les couples (identifiant, texte chiffré en base64)
+
+    Returns:
+        list: Les couples (identifiant, texte déchiffré), dans le même ordre
+    """
+    return [(pk, worker_context.decrypt(encrypted_text)) for pk, encrypted_text in rows]
 
-        # Encodage en base64 pour obtenir une empreinte lisible
-        return base64.b64encode(combined_digest).decode('utf-8')
 
 # Exemple d'utilisation
 if __name__ == "__main__":
@@ -282,8 +412,8 @@ if __name__ == "__main__":
 
     # Test de l'empreinte déterministe
     test_text = "Ceci est un exemple"
-    fingerprint1 = Crypto.generate_fingerprint(test_text, public_key)
-    fingerprint2 = Crypto.generate_fingerprint(test_text, public_key)
+    fingerprint1 = RGPD.generate_fingerprint(test_text, public_key)
+    fingerprint2 = RGPD.from_public_key(public_key).fingerprint(test_text)
     print(f"\nTest d'empreinte pour '{test_text}':")
     print(f"Empreinte 1: {fingerprint1}")
     print(f"Empreinte 2: {fingerprint2}")
@@ -0,0 +1,30 @@
+from .business_hours import business_durations
+
+ONE_MINUTE_US = 60 * 10 ** 6
+
+
+def closed_park_totals(rows, totals=None):
+    """
+    Cumule, par véhicule, les stationnements terminés : nombre, minutes ouvrées et plus long séjour
+
+    Args:
+        rows (iterable): Tuples (vehicle_id, arrival, departure) de stationnements terminés
+        totals (dict): Cumuls à compléter, pour traiter les stationnements par paquets (optionnel)
+
+    Returns:
+        dict: Pour chaque véhicule, un tuple (nombre, minutes ouvrées, plus long séjour en timedelta)
+    """
+    totals = {} if totals is None else totals
+    rows = list(rows)
+    durations = business_durations([row[1] for row in rows], [row[2] for row in rows])
+
+    for (vehicle_id, arrival, departure), us in zip(rows, durations):
+        count, minutes, longest = totals.get(vehicle_id, (0, 0, None))
+        stay = departure - arrival
+        totals[vehicle_id] = (
+            count + 1,
+            minutes + int(us) // ONE_MINUTE_US,
+            stay if longest is None or stay > longest else longest,
+        )
+
+    return totals
@@ -0,0 +1,60 @@
+import threading
+
+try:
+    # Notifications du système de fichiers (inotify sous Linux), si watchdog est installé
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class ChangeHandler(FileSystemEventHandler):
+    """Signale toute modification du dossier surveillé"""
+
+    def __init__(self, changed):
+        super().__init__()
+        self.changed = changed
+
+    def on_any_event(self, event):
+        self.changed.set()
+
+
+class DirectoryWatcher:
+    """
+    Attend les modifications d'un dossier : réveil immédiat par notification (watchdog)
+    si disponible, sinon simple scrutation périodique
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Dossier à surveiller, récursivement
+        """
+        self.changed = threading.Event()
+        self.observer = None
+
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(ChangeHandler(self.changed), path, recursive=True)
+            self.observer.start()
+
+    @property
+    def mode(self):
+        return 'notifications' if self.observer is not None else 'scrutation'
+
+    def wait(self, timeout):
+        """
+        Attend une modification du dossier, au plus `timeout` secondes
+
+        Returns:
+            bool: True si une modification a été signalée
+        """
+        changed = self.changed.wait(timeout)
+        self.changed.clear()
+        return changed
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
@@ -1,37 +1,223 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Exists, F, Min, OuterRef, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
-from .models import Vehicle, Park
+from .models import Vehicle, VehicleStats, Park
+from .utils.export import COLUMNS, EXPORT_FORMATS, PARQUET_AVAILABLE, export_data, export_queryset, iter_chunks
+from .utils.occupancy import PERIODS, occupancy_report, parse_moment
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Tris disponibles : clé d'annotation, sens décroissant
+SORTS = {
+    'vehicle': ('id', False),
+    'recent': ('last_arrival', True),
+    'parks': ('total_parks', True),
+}
+DEFAULT_SORT = 'vehicle'
+
+# Nombre maximal de périodes renvoyées par l'API d'occupation (un peu plus d'un an par heure)
+MAX_BUCKETS = 10000
+PERIOD_SECONDS = {'hour': 3600, 'day': 86400}
+
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'parquet': 'application/vnd.apache.parquet'}
+
+
+def encode_cursor(key, pk):
+    """Encode la position du dernier véhicule affiché pour la page suivante"""
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps([key, pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor, sort):
+    """Décode un curseur de pagination, ou renvoie None s'il est invalide"""
+    try:
+        key, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if SORTS[sort][0] == 'last_arrival':
+            key = datetime.fromisoformat(key)
+        elif SORTS[sort][0] == 'total_parks':
+            key = int(key)
+        return key, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def parks_filter(present, min_days, now):
+    """
+    Construit le filtre des stationnements affichés.
+    La durée en jours suit Park.duration_days : (fin - arrivée).days + 1, la fin étant le départ ou maintenant.
+    """
+    park_q = Q()
+    if present:
+        park_q &= Q(departure__isnull=True)
+    if min_days > 1:
+        delta = timedelta(days=min_days - 1)
+        park_q &= (Q(departure__isnull=True, arrival__lte=now - delta)
+                   | Q(departure__isnull=False, departure__gte=F('arrival') + delta))
+    return park_q
 
 
 def parking_dashboard(request):
     """Vue principale du tableau de bord"""
-    vehicles = Vehicle.objects.all()
+    now = timezone.now()
+
+    # Paramètres de filtrage, de tri et de pagination
+    present = request.GET.get('present') == '1'
+    try:
+        min_days = max(0, int(request.GET.get('min_days', 0)))
+    except ValueError:
+        min_days = 0
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    try:
+        per_page = min(MAX_PAGE_SIZE, max(1, int(request.GET.get('per_page', PAGE_SIZE))))
+    except ValueError:
+        per_page = PAGE_SIZE
+
+    park_q = parks_filter(present, min_days, now)
+    filtered = present or min_days > 1
 
-    vehicle_data = []
-    sum_total_parks = 0
-    sum_current_parks = 0
+    # Statistiques précalculées (VehicleStats) et stationnements de chaque véhicule, en un nombre de requêtes fixe
+    vehicles = Vehicle.objects.select_related('stats').annotate(
+        total_parks=Coalesce('stats__total_parks', 0),
+        current_parks=Coalesce('stats__open_parks', 0),
+        last_arrival=Coalesce('stats__last_arrival', 'created'),
+    ).prefetch_related(
+        Prefetch('park_set', queryset=Park.objects.filter(park_q))
+    )
 
-    for vehicle in vehicles:
-        parks = Park.objects.filter(vehicle=vehicle)
+    if filtered:
+        vehicles = vehicles.filter(Exists(Park.objects.filter(park_q, vehicle=OuterRef('pk'))))
 
-        # Calculer les statistiques
-        total_parks = parks.count()
-        sum_total_parks += total_parks
-        current_parks = parks.filter(departure__isnull=True).count()
-        sum_current_parks += current_parks
+    # Pagination par curseur (keyset) : la page suivante reprend après le dernier véhicule affiché
+    key, descending = SORTS[sort]
+    after = request.GET.get('after')
+    cursor = decode_cursor(after, sort) if after else None
+    if cursor is not None:
+        value, pk = cursor
+        if key == 'id':
+            vehicles = vehicles.filter(id__gt=pk)
+        elif descending:
+            vehicles = vehicles.filter(Q(**{f'{key}__lt': value}) | Q(**{key: value}, id__lt=pk))
+        else:
+            vehicles = vehicles.filter(Q(**{f'{key}__gt': value}) | Q(**{key: value}, id__gt=pk))
 
-        vehicle_data.append({
+    if key == 'id':
+        vehicles = vehicles.order_by('id')
+    elif descending:
+        vehicles = vehicles.order_by(f'-{key}', '-id')
+    else:
+        vehicles = vehicles.order_by(key, 'id')
+
+    page = list(vehicles[:per_page + 1])
+    has_next = len(page) > per_page
+    page = page[:per_page]
+
+    vehicle_data = [
+        {
             'vehicle': vehicle,
-            'parks': parks,
-            'total_parks': total_parks,
-            'current_parks': current_parks,
-        })
+            'parks': vehicle.park_set.all(),
+            'total_parks': vehicle.total_parks,
+            'current_parks': vehicle.current_parks,
+            'stats': getattr(vehicle, 'stats', None),
+        }
+        for vehicle in page
+    ]
+
+    next_query = None
+    if has_next:
+        last = page[-1]
+        params = request.GET.copy()
+        params['after'] = encode_cursor(getattr(last, key), last.id)
+        next_query = params.urlencode()
+
+    first_query = None
+    if cursor is not None:
+        params = request.GET.copy()
+        params.pop('after')
+        first_query = params.urlencode()
+
+    totals = VehicleStats.objects.aggregate(
+        total_parks=Coalesce(Sum('total_parks'), 0),
+        current_parks=Coalesce(Sum('open_parks'), 0),
+    )
 
     context = {
         'vehicle_data': vehicle_data,
-        'current_parks' : sum_current_parks,
-        'total_parks': sum_total_parks,
-        'current_time': timezone.now(),
+        'total_vehicles': Vehicle.objects.count(),
+        'current_parks': totals['current_parks'],
+        'total_parks': totals['total_parks'],
+        'current_time': now,
+        'filtered': filtered,
+        'present': present,
+        'min_days': min_days,
+        'sort': sort,
+        'next_query': next_query,
+        'first_query': first_query,
     }
 
     return render(request, 'parking_tracker/dashboard.html', context)
+
+
+def occupancy_data(request):
+    """
+    Occupation de la rue au format JSON : par période, pics et moyennes par jour de la semaine.
+    Paramètres : period (hour ou day), start et end (AAAA-MM-JJ ou ISO 8601), peaks
+    """
+    period = request.GET.get('period', 'day')
+    if period not in PERIODS:
+        return JsonResponse({'error': f"Période inconnue : {period} (hour ou day)."}, status=400)
+    try:
+        start = parse_moment(request.GET.get('start'))
+        end = parse_moment(request.GET.get('end'))
+        peaks = min(100, max(0, int(request.GET.get('peaks', 5))))
+    except ValueError as e:
+        return JsonResponse({'error': f"Paramètre invalide : {e}."}, status=400)
+
+    parks = Park.objects.all()
+    if start is None:
+        start = parks.aggregate(first=Min('arrival'))['first']
+    if start is not None and ((end or timezone.now()) - start).total_seconds() > MAX_BUCKETS * PERIOD_SECONDS[period]:
+        return JsonResponse({'error': f"Période trop longue : au plus {MAX_BUCKETS} périodes."}, status=400)
+
+    return JsonResponse(occupancy_report(parks, period=period, start=start, end=end, peaks=peaks))
+
+
+@staff_member_required
+def export_table(request, table):
+    """
+    Export des stationnements (avec leurs durées) ou des photos, diffusé au fil de la lecture de la base.
+    Réservé aux membres de l'équipe (connexion à l'administration), les données couvrant tout l'historique.
+    Paramètres : format (csv ou parquet), start et end (AAAA-MM-JJ ou ISO 8601), batch, after_batch
+    """
+    if table not in COLUMNS:
+        return JsonResponse({'error': f"Table inconnue : {table} (parks ou photos)."}, status=404)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"Format inconnu : {export_format} (csv ou parquet)."}, status=400)
+    if export_format == 'parquet' and not PARQUET_AVAILABLE:
+        return JsonResponse({'error': "pyarrow n'est pas installé : export Parquet indisponible."}, status=501)
+
+    try:
+        start = parse_moment(request.GET.get('start'))
+        end = parse_moment(request.GET.get('end'))
+        batch = int(request.GET['batch']) if request.GET.get('batch') else None
+        after_batch = int(request.GET['after_batch']) if request.GET.get('after_batch') else None
+    except ValueError as e:
+        return JsonResponse({'error': f"Paramètre invalide : {e}."}, status=400)
+
+    queryset = export_queryset(table, start=start, end=end, batch=batch, after_batch=after_batch)
+    response = StreamingHttpResponse(export_data(table, export_format, iter_chunks(table, queryset)),
+                                     content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{table}.{export_format}"'
+    return response
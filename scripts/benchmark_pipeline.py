@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout de process_photos, contre le serveur local stub_platerecognizer.py.
+Génère des lots de photos JPEG synthétiques (date EXIF et coordonnées GPS), les traite dans une base
+SQLite temporaire et mesure le débit, la latence de chaque étape (p50/p95, d'après les métriques
+de la commande) et le nombre de requêtes SQL.
+
+Usage :
+    python scripts/benchmark_pipeline.py --photos 200 --workers 4 --output resultats.json
+    python scripts/benchmark_pipeline.py --baseline resultats.json  # échoue en cas de régression
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_project.settings')
+
+import numpy as np
+from PIL import Image
+
+
+def make_photos(directory, count, start, size, seed):
+    """
+    Génère `count` photos JPEG, une par minute à partir de `start`,
+    avec date EXIF et coordonnées GPS
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    width, height = size
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+
+    for i in range(count):
+        # Dégradé et bruit : chaque image est différente, et se compresse comme une photo
+        pixels = gradient + rng.normal(0, 12, (height // 8, width // 8, 3)).repeat(8, 0).repeat(8, 1)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+        exif = Image.Exif()
+        exif[0x0132] = (start + timedelta(minutes=i)).strftime('%Y:%m:%d %H:%M:%S')
+        gps = exif.get_ifd(0x8825)
+        gps.update({1: 'N', 2: (48.0, 51.0, 24.0 + i % 60), 3: 'E', 4: (2.0, 21.0, 7.0)})
+
+        image.save(os.path.join(directory, f'photo_{i:05d}.jpg'), quality=90, exif=exif)
+
+
+# Paramètres qui doivent être identiques pour comparer deux mesures
+PARAMETERS = ('photos', 'batches', 'size', 'vehicles', 'workers', 'cpu_workers', 'latency', 'rate_limited', 'error_rate')
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def start_stub(options):
+    """Démarre le serveur stub sur un port libre et renvoie (processus, URL)"""
+    process = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'scripts', 'stub_platerecognizer.py'), '--port', '0',
+        '--latency', str(options.latency), '--rate-limited', str(options.rate_limited),
+        '--error-rate', str(options.error_rate), '--vehicles', str(options.vehicles),
+    ], stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().split(' : ', 1)[1].strip()
+    return process, url
+
+
+def configure_django(workdir, url):
+    """Base SQLite, clés et URL de l'API propres au benchmark"""
+    import django
+    from django.conf import settings
+
+    settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3',
+                                      'NAME': os.path.join(workdir, 'db.sqlite3')}}
+    settings.SECURITY_PUBLIC_KEY_URL = os.path.join(workdir, 'public_key.pem')
+    settings.SECURITY_PRIVATE_KEY_URL = os.path.join(workdir, 'private_key.pem')
+    settings.PLATE_RECOGNIZER_URL = url
+    django.setup()
+
+    from django.core.management import call_command
+    from parking_tracker.utils.rgpd import RGPD
+
+    public_key_pem, _ = RGPD.generate_key_pair()
+    with open(settings.SECURITY_PUBLIC_KEY_URL, 'wb') as f:
+        f.write(public_key_pem)
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def run(options, workdir):
+    from django.core.management import call_command
+    from parking_tracker.management.commands.process_photos import Command
+
+    timings = defaultdict(list)
+    queries = 0
+
+    input_dir = os.path.join(workdir, 'input')
+    output_dir = os.path.join(workdir, 'output')
+    size = tuple(int(v) for v in options.size.split('x'))
+    photos = elapsed = 0
+
+    for batch in range(options.batches):
+        make_photos(input_dir, options.photos, datetime(2025, 3, 3 + batch, 9), size, seed=batch)
+        command = Command()
+
+        start = time.perf_counter()
+        call_command(command, input_dir=input_dir, output_dir=output_dir, api_key='benchmark',
+                     workers=options.workers, cpu_workers=options.cpu_workers, no_cache=True,
+                     stdout=io.StringIO())
+        elapsed += time.perf_counter() - start
+        photos += options.photos
+
+        # Chronomètres et compteurs intégrés à la commande
+        for stage, values in command.metrics.durations.items():
+            timings[stage].extend(values)
+        queries += command.metrics.counters['db_queries']
+
+    return {
+        'parameters': {name: getattr(options, name) for name in PARAMETERS},
+        'photos': photos,
+        'photos_per_second': photos / elapsed,
+        'queries': queries,
+        'queries_per_photo': queries / photos,
+        'stages': {
+            stage: {'calls': len(values), 'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95)}
+            for stage, values in timings.items()
+        },
+    }
+
+
+def report(results):
+    print(f"   Débit : {results['photos_per_second']:.1f} photos/s ({results['photos']} photos)")
+    print(f"   Requêtes SQL : {results['queries']} ({results['queries_per_photo']:.2f} par photo)")
+    print(f"   {'Étape':<12} {'appels':>7} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for stage, values in results['stages'].items():
+        print(f"   {stage:<12} {values['calls']:>7} {values['p50_ms']:>10.1f} {values['p95_ms']:>10.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """Renvoie la liste des régressions par rapport à une mesure de référence"""
+    regressions = []
+    if results['parameters'] != baseline.get('parameters'):
+        print("⚠️  Paramètres différents de la référence : la comparaison n'est qu'indicative")
+
+    if results['photos_per_second'] < baseline['photos_per_second'] * (1 - tolerance):
+        regressions.append(f"débit {results['photos_per_second']:.1f} < {baseline['photos_per_second']:.1f} photos/s")
+    if results['queries_per_photo'] > baseline['queries_per_photo'] * (1 + tolerance):
+        regressions.append(f"requêtes {results['queries_per_photo']:.2f} > {baseline['queries_per_photo']:.2f} par photo")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end process_photos benchmark')
+    parser.add_argument('--photos', type=int, default=200, help='Photos per batch (default: 200)')
+    parser.add_argument('--batches', type=int, default=2, help='Number of batches (default: 2)')
+    parser.add_argument('--size', default='2016x1512', help='Photo size WIDTHxHEIGHT (default: 2016x1512)')
+    parser.add_argument('--vehicles', type=int, default=50, help='Distinct plates returned by the stub (default: 50)')
+    parser.add_argument('--workers', type=int, default=4, help='process_photos --workers (default: 4)')
+    parser.add_argument('--cpu-workers', type=int, default=0,
+                        help='process_photos --cpu-workers (default: 0, automatic)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub latency in seconds (default: 0.05)')
+    parser.add_argument('--rate-limited', type=float, default=0.0, help='Stub 429 fraction (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Stub 500 fraction (default: 0)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with a previous JSON result and fail on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression against the baseline (default: 0.2)')
+    options = parser.parse_args()
+
+    print("⏱️  Benchmark de process_photos")
+    stub, url = start_stub(options)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            configure_django(workdir, url)
+            results = run(options, workdir)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report(results)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), options.tolerance)
+        for regression in regressions:
+            print(f"❌ Régression : {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Pas de régression")
+
+
+if __name__ == "__main__":
+    main()
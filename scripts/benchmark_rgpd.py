@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark des opérations RGPD par photo : empreinte et chiffrement de la plaque,
+avec rechargement de la clé à chaque appel (méthodes statiques) ou contexte lié à la clé
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parking_tracker.utils.rgpd import RGPD
+
+
+def bench(label, func, number, items=1):
+    """Affiche le temps moyen par élément traité, en microsecondes"""
+    elapsed = timeit.timeit(func, number=number) / (number * items)
+    print(f"   {label:<55} {elapsed * 1e6:8.1f} µs")
+    return elapsed
+
+
+def main(number=2000):
+    print("🔐 Benchmark RGPD")
+    public_key_pem, _ = RGPD.generate_key_pair()
+    plates = [f"AB-{i:03d}-CD" for i in range(number)]
+    rgpd = RGPD.from_public_key(public_key_pem)
+
+    assert rgpd.fingerprint(plates[0]) == RGPD.generate_fingerprint(plates[0], public_key_pem)
+
+    print("Empreinte :")
+    static = bench("RGPD.generate_fingerprint (clé rechargée)",
+                   lambda: RGPD.generate_fingerprint(plates[0], public_key_pem), number)
+    keyed = bench("RGPD.from_public_key(...).fingerprint", lambda: rgpd.fingerprint(plates[0]), number)
+    many = bench("RGPD.from_public_key(...).fingerprint_many (par plaque)",
+                 lambda: rgpd.fingerprint_many(plates), 1, items=number)
+    print(f"   Gain : x{static / keyed:.0f} (x{static / many:.0f} par lot)")
+
+    print("Chiffrement :")
+    static = bench("RGPD.encrypt_text (clé rechargée)", lambda: RGPD.encrypt_text(plates[0], public_key_pem), number)
+    keyed = bench("RGPD.from_public_key(...).encrypt", lambda: rgpd.encrypt(plates[0]), number)
+    print(f"   Gain : x{static / keyed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'envoi des images à PlateRecognizer : octets transmis, pic du tas Python
+(tracemalloc) et pic de mémoire résidente (RSS) par photo, en multipart (octets JPEG bruts)
+ou en champ de formulaire base64.
+Un serveur HTTP local compte les octets reçus à la place de l'API.
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_project.settings')
+
+from PIL import Image, ImageDraw
+
+from parking_tracker.utils.imaging import encode_image
+from parking_tracker.utils.recognizer import PlateRecognizerClient
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """Lit et jette le corps de la requête, en comptant les octets reçus"""
+
+    received = 0
+
+    def do_POST(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        CountingHandler.received += remaining
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 65536)))
+
+        body = json.dumps({'results': []}).encode('utf-8')
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_photo(width=1980, height=1080):
+    """Image de test, encodée comme celles envoyées à l'API"""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, 40):
+        draw.rectangle((i, (i * 7) % height, i + 30, (i * 7) % height + 60), fill=(i % 255, 80, 160))
+    return encode_image(image)
+
+
+def read_status(field):
+    """Valeur en octets d'un champ de /proc/self/status (VmRSS, VmHWM), None hors Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Remet le pic RSS (VmHWM) au niveau actuel ; renvoie False si le noyau ne le permet pas"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def rss_peak_delta(send):
+    """
+    Mesure la hausse du pic de mémoire résidente pendant un envoi
+
+    Args:
+        send (callable): L'envoi à mesurer
+
+    Returns:
+        int: La hausse du pic RSS en octets. Sans remise à zéro possible du pic, repli sur
+             ru_maxrss, qui sous-estime la hausse si un pic antérieur était plus haut.
+    """
+    if reset_peak_rss() and read_status('VmHWM') is not None:
+        before = read_status('VmRSS')
+        send()
+        return max(read_status('VmHWM') - before, 0)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    send()
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024
+
+
+def bench(url, mode, image_bytes, number):
+    """
+    Envoie `number` fois l'image
+
+    Returns:
+        tuple: (octets envoyés, pic du tas Python, pic RSS) par photo
+    """
+    client = PlateRecognizerClient('benchmark', url=url, rate_limit=0, upload_mode=mode)
+    client.recognize_image(image_bytes)
+
+    CountingHandler.received = 0
+    heap_peaks = []
+    for _ in range(number):
+        tracemalloc.start()
+        client.recognize_image(image_bytes)
+        heap_peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    sent = CountingHandler.received / number
+
+    # Boucle séparée : tracemalloc alourdit lui-même la mémoire résidente
+    rss_peaks = [rss_peak_delta(lambda: client.recognize_image(image_bytes)) for _ in range(number)]
+
+    client.close()
+    return sent, max(heap_peaks), max(rss_peaks)
+
+
+def main(number=20):
+    print("📤 Benchmark de l'envoi des images")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/v1/plate-reader/'
+
+    image_bytes = make_photo()
+    print(f"   Image JPEG : {len(image_bytes) / 1024:.0f} Ko")
+
+    results = {}
+    for mode in PlateRecognizerClient.UPLOAD_MODES:
+        sent, heap, rss = bench(url, mode, image_bytes, number)
+        results[mode] = sent, heap, rss
+        print(f"   {mode:<10} {sent / 1024:8.0f} Ko envoyés {heap / 1024:8.0f} Ko de pic du tas Python "
+              f"{rss / 1024:8.0f} Ko de pic RSS")
+
+    print(f"   Gain : x{results['base64'][0] / results['multipart'][0]:.2f} en octets, "
+          f"x{results['base64'][1] / results['multipart'][1]:.1f} en tas Python")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Serveur local remplaçant l'API PlateRecognizer, pour mesurer le traitement des photos sans l'API réelle.
+Les réponses sont déterministes : la plaque dépend de l'empreinte de l'image reçue,
+la boîte de ses dimensions. Latence, erreurs 5xx et réponses 429 sont configurables.
+
+Usage :
+    python scripts/stub_platerecognizer.py --port 8080 --latency 0.05 --rate-limited 0.1
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from PIL import Image
+
+LETTERS = 'ABCDEFGHJKLMNPQRSTVWXYZ'
+
+
+def make_plate(index):
+    """Plaque au format AA-123-AA, différente pour chaque indice de véhicule"""
+    letters = []
+    for _ in range(4):
+        index, rest = divmod(index, len(LETTERS))
+        letters.append(LETTERS[rest])
+    return f"{letters[0]}{letters[1]}{index % 1000:03d}{letters[2]}{letters[3]}"
+
+
+def extract_upload(content_type, body):
+    """Renvoie les octets de l'image envoyée, en multipart ou en champ base64"""
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + body)
+        for part in message.iter_parts():
+            if part.get_param('name', header='content-disposition') == 'upload':
+                return part.get_payload(decode=True)
+        return None
+
+    fields = parse_qs(body.decode('utf-8'))
+    if 'upload' not in fields:
+        return None
+    return base64.b64decode(fields['upload'][0])
+
+
+class StubState:
+    """Configuration et compteurs partagés entre les requêtes"""
+
+    def __init__(self, options):
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'errors': 0}
+
+    def draw(self):
+        """Tire au sort le statut d'une réponse : 429, 500 ou succès"""
+        with self.lock:
+            self.counts['requests'] += 1
+            value = self.random.random()
+
+        if value < self.options.rate_limited:
+            return 429
+        if value < self.options.rate_limited + self.options.error_rate:
+            return 500
+        return 201
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def latency(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.options.jitter, self.options.jitter)
+        return max(0.0, self.options.latency + jitter)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.state.latency())
+
+        status = self.state.draw()
+        if status == 429:
+            self.state.count('rate_limited')
+            return self.reply(429, {'detail': 'Request was throttled.'},
+                              {'Retry-After': str(self.state.options.retry_after)})
+        if status == 500:
+            self.state.count('errors')
+            return self.reply(500, {'detail': 'Internal error.'})
+
+        image_bytes = extract_upload(self.headers.get('Content-Type', ''), body)
+        if not image_bytes:
+            self.state.count('errors')
+            return self.reply(400, {'upload': ['This field is required.']})
+
+        self.state.count('ok')
+        self.reply(201, {'results': self.recognize(image_bytes)})
+
+    def recognize(self, image_bytes):
+        """Résultats déterministes pour une image donnée"""
+        options = self.state.options
+        digest = int.from_bytes(hashlib.sha256(image_bytes).digest()[:8], 'big')
+        if (digest % 1000) / 1000 < options.no_plate:
+            return []
+
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            width, height = img.size
+
+        # Boîte de la taille d'une plaque, positionnée selon l'empreinte
+        box_width, box_height = max(1, width // 8), max(1, height // 20)
+        xmin = (digest >> 16) % max(1, width - box_width)
+        ymin = (digest >> 32) % max(1, height - box_height)
+
+        results = [{
+            'plate': make_plate(digest % options.vehicles).lower(),
+            'score': 0.9,
+            'box': {'xmin': xmin, 'ymin': ymin, 'xmax': xmin + box_width, 'ymax': ymin + box_height},
+        }]
+
+        if (digest >> 48) % 1000 / 1000 < options.second_plate:
+            # Seconde plaque sur la même photo (autre véhicule en arrière-plan)
+            results.append({
+                'plate': make_plate((digest >> 8) % options.vehicles).lower(),
+                'score': 0.8,
+                'box': {'xmin': 0, 'ymin': 0, 'xmax': box_width, 'ymax': box_height},
+            })
+
+        return results
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description='Local PlateRecognizer stand-in')
+    parser.add_argument('--host', default='127.0.0.1', help='Listening address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Listening port (default: 8080)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Response latency in seconds (default: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random latency variation in seconds (default: 0)')
+    parser.add_argument('--rate-limited', type=float, default=0.0,
+                        help='Fraction of requests answered with 429 (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=0, help='Retry-After header of 429 responses (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 500 (default: 0)')
+    parser.add_argument('--no-plate', type=float, default=0.0,
+                        help='Fraction of images without any detected plate (default: 0)')
+    parser.add_argument('--second-plate', type=float, default=0.0,
+                        help='Fraction of images with a second plate (default: 0)')
+    parser.add_argument('--vehicles', type=int, default=50, help='Number of distinct plates returned (default: 50)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for latency and error draws (default: 0)')
+    return parser
+
+
+def make_server(options):
+    """Crée le serveur (non démarré) pour les options données"""
+    handler = type('Handler', (StubHandler,), {'state': StubState(options)})
+    return ThreadingHTTPServer((options.host, options.port), handler)
+
+
+def main():
+    options = make_parser().parse_args()
+    server = make_server(options)
+    print(f"🚗 Stub PlateRecognizer : http://{options.host}:{server.server_port}/v1/plate-reader/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"   {server.RequestHandlerClass.state.counts}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()